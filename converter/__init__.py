@@ -7,11 +7,11 @@ A modular package for converting static websites to ZIM archive format.
 from .zim_item import MyItem
 from .validation import validate_language_code, validate_filename, sanitize_filename
 from .config import setup_logging, load_config, validate_config
-from .image_optimizer import optimize_image, is_pillow_available
+from .image_optimizer import optimize_image, prune_image_cache, is_pillow_available, is_optimizer_available
 from .report_generator import generate_link_validation_report
-from .mime_types import MIME_TYPES, get_mime_type
-from .file_processor import process_html_content, process_dry_run, process_files, cleanup_unreferenced
-from .external_deps import resolve_external_dependencies, replace_external_urls
+from .mime_types import MIME_TYPES, MIME_EXTENSIONS, get_mime_type, guess_mime_type
+from .file_processor import collect_site_files, order_for_archive, process_html_content, process_dry_run, process_files, cleanup_unreferenced
+from .external_deps import resolve_external_dependencies, replace_external_urls, compile_url_mapping
 
 __all__ = [
     'MyItem',
@@ -22,16 +22,23 @@ __all__ = [
     'load_config',
     'validate_config',
     'optimize_image',
+    'prune_image_cache',
     'is_pillow_available',
+    'is_optimizer_available',
     'generate_link_validation_report',
     'MIME_TYPES',
+    'MIME_EXTENSIONS',
     'get_mime_type',
+    'guess_mime_type',
+    'collect_site_files',
+    'order_for_archive',
     'process_html_content',
     'process_dry_run',
     'process_files',
     'cleanup_unreferenced',
     'resolve_external_dependencies',
     'replace_external_urls',
+    'compile_url_mapping',
 ]
 
 __version__ = '1.0.0'
@@ -2,9 +2,11 @@
 Configuration and logging setup utilities.
 """
 
+import copy
 import json
 import logging
 import sys
+from functools import lru_cache
 from pathlib import Path
 
 
@@ -28,6 +30,9 @@ def setup_logging(verbose=False, quiet=False):
     """
     Configure logging based on verbosity settings.
 
+    Safe to call more than once: if logging is already configured, only
+    the level is updated.
+
     Args:
         verbose: Enable DEBUG level logging
         quiet: Enable ERROR level logging only
@@ -42,18 +47,33 @@ def setup_logging(verbose=False, quiet=False):
     else:
         level = logging.INFO
 
-    logging.basicConfig(
-        level=level,
-        format='%(levelname)s: %(message)s',
-        stream=sys.stdout
-    )
+    root = logging.getLogger()
+    if root.handlers:
+        root.setLevel(level)
+    else:
+        logging.basicConfig(
+            level=level,
+            format='%(levelname)s: %(message)s',
+            stream=sys.stdout
+        )
     return logging.getLogger(__name__)
 
 
+@lru_cache(maxsize=32)
+def _load_config_cached(path, mtime_ns):
+    """Parse a config file; cached per (path, modification time)."""
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
 def load_config(config_path):
     """
     Load configuration from JSON file.
 
+    Parsed files are cached by path and modification time, so repeated
+    loads in one process (e.g. batch runs) skip the JSON parse. Each call
+    returns its own copy.
+
     Args:
         config_path: Path to JSON configuration file
 
@@ -69,8 +89,8 @@ def load_config(config_path):
         sys.exit(1)
 
     try:
-        with open(config_file, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        config = _load_config_cached(str(config_file.resolve()), config_file.stat().st_mtime_ns)
+        return copy.deepcopy(config)
     except json.JSONDecodeError as e:
         logging.error(f"Invalid JSON in config file: {e}")
         sys.exit(1)
@@ -6,14 +6,19 @@ Detects external URLs in HTML/CSS files, downloads them locally into
 so resources work offline.
 """
 
-import hashlib
+import json
 import logging
 import os
 import re
+import shutil
 import ssl
 import urllib.request
+import zlib
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import lru_cache
 from pathlib import Path
-from urllib.parse import urlparse, unquote
+from urllib.parse import quote, urlparse, unquote
 
 try:
     from tqdm import tqdm
@@ -22,15 +27,28 @@ except ImportError:
     TQDM_AVAILABLE = False
 
 
-# Regex patterns for external resource URLs in HTML/CSS
+# Number of concurrent download threads (downloads are network-bound)
+DOWNLOAD_WORKERS = 16
+# Buffer size used to stream downloads to disk
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+_USER_AGENT = 'Mozilla/5.0 (X11; Linux x86_64; rv:109.0) Gecko/20100101 Firefox/115.0'
+
+# Site files scanned for external URLs
+_TEXT_EXTENSIONS = frozenset(('.html', '.htm', '.css'))
+
+# URL replacement table built once per run by compile_url_mapping()
+CompiledUrlMapping = namedtuple('CompiledUrlMapping', ['mapping', 'pattern'])
+
+# Regex patterns for external resource URLs in HTML/CSS.
+# Patterns are ASCII and run on raw file bytes (no decode needed).
 # Matches src="https://..." or src="//..."
-_RE_SRC = re.compile(r'src=["\']((https?:)?//[^"\']+)["\']')
+_RE_SRC = re.compile(rb'src=["\']((https?:)?//[^"\']+)["\']')
 # Matches <link ... href="https://..." or href="//..." (but NOT <a href=...)
-_RE_LINK_HREF = re.compile(r'<link\b[^>]*\bhref=["\']((https?:)?//[^"\']+)["\']')
+_RE_LINK_HREF = re.compile(rb'<link\b[^>]*\bhref=["\']((https?:)?//[^"\']+)["\']')
 # Matches url(https://...) or url("https://...") or url('https://...')
-_RE_CSS_URL = re.compile(r'url\(["\']?((https?:)?//[^"\')\s]+)["\']?\)')
+_RE_CSS_URL = re.compile(rb'url\(["\']?((https?:)?//[^"\')\s]+)["\']?\)')
 # Matches @import "https://..." or @import url(...)
-_RE_CSS_IMPORT = re.compile(r'@import\s+["\']((https?:)?//[^"\']+)["\']')
+_RE_CSS_IMPORT = re.compile(rb'@import\s+["\']((https?:)?//[^"\']+)["\']')
 
 
 def find_external_urls(content):
@@ -40,24 +58,27 @@ def find_external_urls(content):
     Does NOT match <a href="..."> navigation links.
 
     Args:
-        content: HTML or CSS content string
+        content: HTML or CSS content bytes
 
     Returns:
-        set: Unique external URLs found
+        set: Unique external URLs found (as str)
     """
     urls = set()
     for pattern in (_RE_SRC, _RE_LINK_HREF, _RE_CSS_URL, _RE_CSS_IMPORT):
         for match in pattern.finditer(content):
-            urls.add(match.group(1))
+            urls.add(match.group(1).decode('utf-8', errors='surrogateescape'))
     return urls
 
 
+@lru_cache(maxsize=None)
 def url_to_local_path(url):
     """
     Convert a URL to a safe local path under `_external/`.
 
+    Memoized: the same URL is converted several times during resolution.
+
     Protocol-relative URLs are normalized to https.
-    Query strings get an MD5 hash suffix.
+    Query strings get a CRC32 hash suffix (8 hex chars).
     '@' characters in paths are replaced with '_'.
 
     Args:
@@ -78,7 +99,8 @@ def url_to_local_path(url):
 
     # Handle query strings
     if parsed.query:
-        query_hash = hashlib.md5(parsed.query.encode()).hexdigest()[:8]
+        # URLs are decoded with surrogateescape; re-encode the original bytes
+        query_hash = format(zlib.crc32(parsed.query.encode('utf-8', errors='surrogateescape')), '08x')
         # Determine extension from path or default to .css for stylesheet endpoints
         _, ext = os.path.splitext(path)
         if ext:
@@ -94,11 +116,27 @@ def url_to_local_path(url):
     return f"_external/{domain}/{path}"
 
 
+@lru_cache(maxsize=None)
+def _get_opener():
+    """
+    Build the URL opener shared by all downloads.
+
+    Created on first use so the SSL trust store is loaded once per run,
+    not once per download (and not at all when nothing is downloaded).
+    """
+    # SSL context that works with most CDNs
+    ctx = ssl.create_default_context()
+    opener = urllib.request.build_opener(urllib.request.HTTPSHandler(context=ctx))
+    opener.addheaders = [('User-Agent', _USER_AGENT)]
+    return opener
+
+
 def download_resource(url, dest_path):
     """
     Download a URL to a local file path.
 
     Uses Mozilla User-Agent. 30s timeout. Skips if already downloaded.
+    The response is streamed to disk rather than held in memory.
 
     Args:
         url: URL to download
@@ -115,30 +153,120 @@ def download_resource(url, dest_path):
 
     if url.startswith('//'):
         url = 'https:' + url
+    if not url.isascii():
+        # Percent-encode raw (surrogateescape-decoded) bytes for the request line
+        url = quote(url.encode('utf-8', errors='surrogateescape'), safe="%/:=&?~#+!$,;'@()*[]")
 
     dest.parent.mkdir(parents=True, exist_ok=True)
 
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (X11; Linux x86_64; rv:109.0) Gecko/20100101 Firefox/115.0'
-    }
-    req = urllib.request.Request(url, headers=headers)
-
-    # Create SSL context that works with most CDNs
-    ctx = ssl.create_default_context()
-
+    # Stream into a temporary file so an interrupted download never leaves
+    # a truncated file that would be taken as already downloaded
+    tmp = dest.with_name(dest.name + '.part')
     try:
-        with urllib.request.urlopen(req, timeout=30, context=ctx) as response:
-            data = response.read()
-            with open(dest, 'wb') as f:
-                f.write(data)
-        logger.debug(f"Downloaded: {url} -> {dest_path}")
+        with _get_opener().open(url, timeout=30) as response:
+            if response.status != 200:
+                logger.warning(f"Failed to download {url}: HTTP {response.status}")
+                return False
+            with open(tmp, 'wb') as f:
+                shutil.copyfileobj(response, f, DOWNLOAD_CHUNK_SIZE)
+        os.replace(tmp, dest)
+        logger.debug("Downloaded: %s -> %s", url, dest_path)
         return True
     except Exception as e:
         logger.warning(f"Failed to download {url}: {e}")
+        tmp.unlink(missing_ok=True)
         return False
 
 
-def resolve_external_dependencies(load_path, logger):
+def _iter_text_files(root):
+    """
+    Yield the HTML/CSS files under root in a single directory traversal.
+
+    `_external` directories (downloaded resources) are not descended into.
+    Symlinked directories are not followed.
+    """
+    stack = [os.fspath(root)]
+    while stack:
+        try:
+            with os.scandir(stack.pop()) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        if entry.name != '_external':
+                            stack.append(entry.path)
+                    elif os.path.splitext(entry.name)[1].lower() in _TEXT_EXTENSIONS:
+                        yield Path(entry.path)
+        except OSError:
+            continue
+
+
+def _load_scan_cache(cache_file):
+    """Load the URL scan cache written by a previous run ({} if missing or unreadable)."""
+    try:
+        with open(cache_file, 'r', encoding='utf-8') as fp:
+            cache = json.load(fp)
+    except (OSError, ValueError):
+        return {}
+    return cache if isinstance(cache, dict) else {}
+
+
+def _save_scan_cache(cache_file, cache, logger):
+    """Atomically write the URL scan cache."""
+    tmp = f"{cache_file}.part"
+    try:
+        with open(tmp, 'w', encoding='utf-8') as fp:
+            json.dump(cache, fp)
+        os.replace(tmp, cache_file)
+    except OSError as e:
+        logger.warning(f"Failed to save external URL scan cache: {e}")
+
+
+def _scan_external_urls(filepath, cache, new_cache):
+    """
+    Find the external URLs of one file, reusing the cached scan if unchanged.
+
+    Args:
+        filepath: Path of the HTML/CSS file
+        cache: Scan cache loaded from the previous run
+        new_cache: Scan cache for this run, updated with the file's entry
+
+    Returns:
+        list: External URLs found in the file
+    """
+    key = str(filepath)
+    st = filepath.stat()
+    entry = cache.get(key)
+    if entry is not None and entry[:2] == [st.st_mtime_ns, st.st_size]:
+        urls = entry[2]
+    else:
+        urls = sorted(find_external_urls(filepath.read_bytes()))
+    new_cache[key] = [st.st_mtime_ns, st.st_size, urls]
+    return urls
+
+
+def _group_by_local_path(urls, urls_by_path, logger):
+    """
+    Add URLs to a {local_path: urls} grouping, skipping any that cannot be mapped.
+
+    Args:
+        urls: Iterable of external URLs
+        urls_by_path: Grouping to update
+        logger: Logger instance
+    """
+    for url in urls:
+        try:
+            local_path = url_to_local_path(url)
+        except Exception as e:
+            logger.warning(f"Skipping external URL {url!r}: {e}")
+            continue
+        urls_by_path.setdefault(local_path, set()).add(url)
+
+
+def _download_any(urls, dest_path):
+    """Download the first of several URLs sharing one local path that succeeds."""
+    return any(download_resource(url, dest_path) for url in sorted(urls))
+
+
+def resolve_external_dependencies(load_path, logger, cache_file=None):
     """
     Main entry point: scan site files for external URLs, download them locally.
 
@@ -147,9 +275,18 @@ def resolve_external_dependencies(load_path, logger):
     3. Recursively scan downloaded CSS files for nested URLs (max depth 3)
     4. Return mapping of {original_url: local_relative_path}
 
+    Alternate protocol forms (// vs https://) are added by
+    compile_url_mapping() rather than stored in the returned mapping.
+
+    Resources already present under `_external/` are not downloaded
+    again. With a cache_file, the URLs found in each file are also kept
+    there, keyed on its mtime and size, so a rebuild only re-scans the
+    files that changed.
+
     Args:
         load_path: Path to the site root directory
         logger: Logger instance
+        cache_file: Optional path of the URL scan cache
 
     Returns:
         dict: Mapping of original URL -> local relative path
@@ -157,109 +294,161 @@ def resolve_external_dependencies(load_path, logger):
     load_path = Path(load_path)
     url_mapping = {}
     urls_to_download = set()
+    scan_cache = _load_scan_cache(cache_file) if cache_file is not None else {}
+    new_scan_cache = {}
 
     # Phase 1: Scan existing HTML/CSS files
     logger.info("Scanning for external dependencies...")
-    for pattern in ('**/*.html', '**/*.htm', '**/*.css'):
-        for filepath in load_path.glob(pattern):
-            # Skip _external directory itself
-            if '_external' in filepath.parts:
-                continue
-            try:
-                with open(filepath, 'r', encoding='utf-8', errors='replace') as f:
-                    content = f.read()
-                urls = find_external_urls(content)
-                urls_to_download.update(urls)
-            except Exception as e:
-                logger.warning(f"Failed to scan {filepath}: {e}")
+    for filepath in _iter_text_files(load_path):
+        try:
+            urls_to_download.update(_scan_external_urls(filepath, scan_cache, new_scan_cache))
+        except Exception as e:
+            logger.warning(f"Failed to scan {filepath}: {e}")
 
     if not urls_to_download:
         logger.info("No external dependencies found.")
+        if cache_file is not None:
+            _save_scan_cache(cache_file, new_scan_cache, logger)
         return {}
 
     logger.info(f"Found {len(urls_to_download)} external URLs to resolve.")
 
     # Phase 2: Download all resources
     downloaded_css = []
-    url_iter = tqdm(urls_to_download, desc="Downloading", unit="file") if TQDM_AVAILABLE else urls_to_download
-    for url in url_iter:
-        local_path = url_to_local_path(url)
-        dest = load_path / local_path
-        if download_resource(url, dest):
-            url_mapping[url] = local_path
-            # Track CSS files for recursive scanning
-            if local_path.endswith('.css'):
-                downloaded_css.append((local_path, 1))
-
-    # Phase 3: Recursively scan downloaded CSS files (max depth 3)
-    if TQDM_AVAILABLE and downloaded_css:
-        pbar = tqdm(desc="Resolving nested CSS", unit="file")
-    else:
-        pbar = None
-    while downloaded_css:
-        css_path, depth = downloaded_css.pop(0)
-        if depth > 3:
-            continue
-        full_path = load_path / css_path
-        if not full_path.exists():
-            continue
-        try:
-            with open(full_path, 'r', encoding='utf-8', errors='replace') as f:
-                content = f.read()
-            nested_urls = find_external_urls(content)
-            for url in nested_urls:
-                if url in url_mapping:
-                    continue
-                local_path = url_to_local_path(url)
-                dest = load_path / local_path
-                if download_resource(url, dest):
+    with ThreadPoolExecutor(max_workers=DOWNLOAD_WORKERS) as executor:
+        # Group URLs by destination so two threads never write the same file
+        # (e.g. "//cdn/x.js" and "https://cdn/x.js")
+        urls_by_path = {}
+        _group_by_local_path(urls_to_download, urls_by_path, logger)
+        futures = {
+            executor.submit(_download_any, urls, load_path / local_path): local_path
+            for local_path, urls in urls_by_path.items()
+        }
+
+        done_iter = as_completed(futures)
+        if TQDM_AVAILABLE:
+            done_iter = tqdm(done_iter, total=len(futures), desc="Downloading", unit="file")
+        for future in done_iter:
+            local_path = futures[future]
+            if future.result():
+                for url in urls_by_path[local_path]:
                     url_mapping[url] = local_path
+                # Track CSS files for recursive scanning
+                if local_path.endswith('.css'):
+                    downloaded_css.append(local_path)
+
+        # Phase 3: Recursively scan downloaded CSS files (max depth 3),
+        # one depth level per batch so each level downloads concurrently
+        if TQDM_AVAILABLE and downloaded_css:
+            pbar = tqdm(desc="Resolving nested CSS", unit="file")
+        else:
+            pbar = None
+        depth = 1
+        while downloaded_css and depth <= 3:
+            urls_by_path = {}
+            for css_path in downloaded_css:
+                full_path = load_path / css_path
+                if not full_path.exists():
+                    continue
+                try:
+                    nested_urls = _scan_external_urls(full_path, scan_cache, new_scan_cache)
+                except Exception as e:
+                    logger.warning(f"Failed to scan nested CSS {css_path}: {e}")
+                    continue
+                _group_by_local_path((url for url in nested_urls if url not in url_mapping),
+                                     urls_by_path, logger)
+            futures = {
+                executor.submit(_download_any, urls, load_path / local_path): local_path
+                for local_path, urls in urls_by_path.items()
+            }
+
+            downloaded_css = []
+            for future in as_completed(futures):
+                local_path = futures[future]
+                if future.result():
+                    for url in urls_by_path[local_path]:
+                        url_mapping[url] = local_path
                     if pbar is not None:
                         pbar.update(1)
                     if local_path.endswith('.css'):
-                        downloaded_css.append((local_path, depth + 1))
-        except Exception as e:
-            logger.warning(f"Failed to scan nested CSS {css_path}: {e}")
-    if pbar is not None:
-        pbar.close()
+                        downloaded_css.append(local_path)
+            depth += 1
+        if pbar is not None:
+            pbar.close()
+
+    url_to_local_path.cache_clear()
+    if cache_file is not None:
+        _save_scan_cache(cache_file, new_scan_cache, logger)
 
-    # Phase 4: Register alternate protocol forms
-    # For each URL, ensure both // and https:// forms are mapped
-    extras = {}
+    logger.info(f"Resolved {len(url_mapping)} external dependencies.")
+    return url_mapping
+
+
+def compile_url_mapping(url_mapping):
+    """
+    Build the URL replacement table once for a whole conversion run.
+
+    Both the protocol-relative (//) and https:// forms of each URL are
+    mapped to the same local path, and a single regex matching every URL
+    is compiled. URLs are sorted by length descending so that, at any
+    position, the longest URL wins (prevents partial replacements of
+    shorter URLs that are substrings of longer ones).
+
+    Args:
+        url_mapping: dict mapping {original_url: local_relative_path}
+
+    Returns:
+        CompiledUrlMapping: (mapping, pattern) with UTF-8 encoded URLs and
+        paths, or None if the mapping is empty
+    """
+    if not url_mapping:
+        return None
+
+    mapping = dict(url_mapping)
     for url, local_path in url_mapping.items():
         if url.startswith('https://'):
-            alt = '//' + url[len('https://'):]
-            if alt not in url_mapping:
-                extras[alt] = local_path
+            mapping.setdefault('//' + url[len('https://'):], local_path)
         elif url.startswith('//'):
-            alt = 'https:' + url
-            if alt not in url_mapping:
-                extras[alt] = local_path
-    url_mapping.update(extras)
+            mapping.setdefault('https:' + url, local_path)
+
+    # Content is rewritten as bytes, so the table is kept encoded
+    mapping = {url.encode('utf-8', errors='surrogateescape'): local_path.encode('utf-8', errors='surrogateescape')
+               for url, local_path in mapping.items()}
+    pattern = re.compile(b'|'.join(re.escape(url) for url in sorted(mapping, key=len, reverse=True)))
+    return CompiledUrlMapping(mapping, pattern)
 
-    logger.info(f"Resolved {len(url_mapping)} external dependencies.")
-    return url_mapping
+
+@lru_cache(maxsize=None)
+def _depth_prefix(depth):
+    """
+    Return the b"../" prefix leading from a page at this depth to the site root.
+
+    Sites only have a handful of distinct depths, so every page at a given
+    depth shares one bytes object instead of allocating its own.
+    """
+    return b"../" * depth
 
 
 def replace_external_urls(content, url_mapping, depth):
     """
     Replace external URLs in content with local relative paths.
 
-    Simple string replacement - external URLs are unique strings.
+    Single regex pass over the content regardless of mapping size.
     Files are never modified on disk; this operates in-memory.
 
     Args:
-        content: HTML or CSS content string
-        url_mapping: dict mapping {original_url: local_relative_path}
+        content: HTML or CSS content bytes
+        url_mapping: CompiledUrlMapping from compile_url_mapping(), or a
+            plain {original_url: local_relative_path} dict (compiled on the fly)
         depth: Directory depth of the file being processed (for ../ prefix)
 
     Returns:
-        str: Content with external URLs replaced by local paths
+        bytes: Content with external URLs replaced by local paths
     """
-    prefix = "../" * depth
-    # Sort by length descending so longer URLs are replaced first
-    # (prevents partial replacements of shorter URLs that are substrings)
-    for url in sorted(url_mapping.keys(), key=len, reverse=True):
-        local_path = url_mapping[url]
-        content = content.replace(url, prefix + local_path)
-    return content
+    if not isinstance(url_mapping, CompiledUrlMapping):
+        url_mapping = compile_url_mapping(url_mapping)
+        if url_mapping is None:
+            return content
+    mapping, pattern = url_mapping
+    prefix = _depth_prefix(depth)
+    return pattern.sub(lambda m: prefix + mapping[m.group(0)], content)
@@ -3,7 +3,16 @@ File processing logic for ZIM conversion.
 """
 
 import logging
+import mmap
+import multiprocessing
+import os
+import posixpath
 import re
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from itertools import repeat
 from pathlib import Path
 
 try:
@@ -13,116 +22,382 @@ except ImportError:
     TQDM_AVAILABLE = False
 
 from .zim_item import MyItem
-from .mime_types import MIME_TYPES
+from .config import setup_logging
+from .mime_types import MIME_TYPES, MIME_EXTENSIONS, guess_mime_type
 from .image_optimizer import optimize_image
-from .external_deps import replace_external_urls
+from .external_deps import compile_url_mapping, _depth_prefix, replace_external_urls
+
+
+# Number of files handed to a worker process at a time
+WORKER_CHUNKSIZE = 32
+# Batches prepared ahead of the ZIM writer, per worker process. Bounds the
+# memory held by prepared (e.g. optimized image) content waiting to be added.
+WORKER_AHEAD = 2
+# HTML files from this size on are memory-mapped for scanning and rewriting
+# rather than read into a heap copy; below it a plain read is cheaper
+HTML_MMAP_MIN_SIZE = 64 * 1024
+
+# Extensions (lower-case, without dot) handled specially
+_HTML_EXTS = frozenset(('html', 'htm'))
+_IMAGE_EXTS = frozenset(('jpg', 'jpeg', 'png'))
+_TEXT_EXTS = _HTML_EXTS | {'css'}
+
+# Version-control metadata directories, never part of a site
+_SKIP_WALK_DIRS = frozenset(('.git', '.hg', '.svn'))
+
+# Archive write order by extension (see order_for_archive); unlisted
+# extensions go last
+_ARCHIVE_ORDER = {
+    'html': 0, 'htm': 0,
+    'css': 1, 'js': 1,
+    'woff2': 2, 'woff': 2, 'ttf': 2, 'otf': 2, 'eot': 2, 'svg': 2,
+    'png': 3, 'jpg': 3, 'jpeg': 3, 'gif': 3, 'webp': 3, 'ico': 3, 'bmp': 3,
+}
+_ARCHIVE_ORDER_OTHER = 9
+
+# All content patterns are ASCII and run on raw file bytes, so HTML/CSS is
+# never decoded and re-encoded on its way into the ZIM.
+# One-pass HTML rewrite. First alternative: href/src values ending with "/"
+# (attribute in group 1, value in group 2), which should point to an
+# index.html and get the depth prefix if root-relative. Second alternative:
+# any other root-relative path (prefix in group 3), rewritten relative to
+# the page depth.
+_RE_HTML_REWRITE = re.compile(rb'(href="|src=")([^"]*/)(?=")|(href="|src="|url\(|url\(")/')
+# Literals every _RE_HTML_REWRITE match starts with; a page containing
+# none of them is passed through without running the regex
+_HTML_REWRITE_TOKENS = (b'href="', b'src="', b'url(')
+# Directory-style href values, checked for index.html in dry-run mode
+_RE_HREF_DIR = re.compile(rb'href="([^"]+/)"')
+
+# Patterns to extract asset references from HTML
+_HTML_REF_PATTERNS = (
+    re.compile(rb'(?:href|src|poster|data-src)=["\']([^"\'#?]+)', re.IGNORECASE),
+    re.compile(rb'srcset=["\']([^"\']+)["\']', re.IGNORECASE),
+    re.compile(rb'url\(["\']?([^"\')\s#?]+)', re.IGNORECASE),
+)
+# Pattern for CSS url() references
+_CSS_REF_PATTERNS = (
+    re.compile(rb'url\(["\']?([^"\')\s#?]+)', re.IGNORECASE),
+)
+
+
+def collect_site_files(load_path):
+    """
+    List every file under the site root in a single scandir traversal.
+
+    Directory entries carry their file type, so unlike rglob + is_file()
+    no extra stat is issued per entry. Symlinked directories are not
+    followed; symlinked files are kept. Version-control directories
+    (.git, .hg, .svn) are not entered. Files come out in the same
+    directory pre-order as Path.rglob("*").
+
+    Paths are returned as plain strings: every later pass works on the
+    path string, and strings are far cheaper to build and to pickle to
+    worker processes than Path objects.
+
+    Args:
+        load_path: Root path of the site
+
+    Returns:
+        list: Path string of each file
+    """
+    files = []
+    stack = [os.fspath(load_path)]
+    while stack:
+        subdirs = []
+        try:
+            with os.scandir(stack.pop()) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        if entry.name not in _SKIP_WALK_DIRS:
+                            subdirs.append(entry.path)
+                    elif entry.is_file():
+                        files.append(entry.path)
+        except OSError:
+            continue
+        stack.extend(reversed(subdirs))
+    return files
+
+
+def order_for_archive(all_files, load_path):
+    """
+    Sort files into the order they should be written to the ZIM.
+
+    The main page comes first, then pages, stylesheets and scripts, fonts,
+    images and finally bulk assets, each group sorted by path. libzim fills
+    clusters in insertion order, so this keeps the content a reader opens
+    together (a page and what it renders with) close together in the file.
+
+    Args:
+        all_files: List of all files to process
+        load_path: Root path of the site
+
+    Returns:
+        list: The same files, sorted
+    """
+    root_prefix = _root_prefix(load_path)
+
+    def key(filepath):
+        relpath = _relpath(filepath, load_path, root_prefix)
+        return (relpath != 'index.html',
+                _ARCHIVE_ORDER.get(_file_ext(relpath), _ARCHIVE_ORDER_OTHER),
+                relpath)
+
+    return sorted(all_files, key=key)
+
+
+def _root_prefix(load_path):
+    """String prefix stripped from collected file paths to get their relative path."""
+    root = os.fspath(load_path)
+    # Paths under "." are collected without a "./" prefix
+    return '' if root == '.' else root.rstrip(os.sep) + os.sep
+
+
+def _relpath(filepath, load_path, root_prefix):
+    """Relative path of a collected file, by string slicing when possible."""
+    fp_str = os.fspath(filepath)
+    if fp_str.startswith(root_prefix):
+        return fp_str[len(root_prefix):]
+    return os.path.relpath(fp_str, load_path)
+
+
+def _file_ext(path):
+    """Lower-case extension of a path, without the dot ('' if none)."""
+    return os.path.splitext(path)[1][1:].lower()
+
+
+def _site_index_dirs(all_files, load_path):
+    """
+    Collect the site directories that contain an index.html.
+
+    Args:
+        all_files: List of all files to process
+        load_path: Root path of the site
+
+    Returns:
+        frozenset: Site-relative directory paths ('' for the root)
+    """
+    root_prefix = _root_prefix(load_path)
+    index_dirs = set()
+    for filepath in all_files:
+        fp_str = os.fspath(filepath)
+        if os.path.basename(fp_str) == 'index.html' and fp_str.startswith(root_prefix):
+            index_dirs.add(os.path.dirname(fp_str[len(root_prefix):]).replace(os.sep, '/'))
+    return frozenset(index_dirs)
+
+
+@contextmanager
+def _html_source(filepath):
+    """
+    Open an HTML file as a read-only buffer for the byte patterns.
+
+    Large files are memory-mapped, so only the rewritten output is held in
+    memory next to the page cache; small files are read.
+
+    Args:
+        filepath: Path to the HTML file
+
+    Yields:
+        bytes or mmap: File content, valid until the block exits
+    """
+    with open(filepath, 'rb') as fp:
+        if os.fstat(fp.fileno()).st_size < HTML_MMAP_MIN_SIZE:
+            yield fp.read()
+            return
+        with mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            yield mm
+
 
+def _is_external_link(link):
+    """True for protocol-relative or scheme-qualified links (https:, mailto:...)."""
+    return link.startswith('//') or ':' in link.split('/', 1)[0]
 
-def process_html_content(data, depth, filepath, load_path, lst_missing_index, relpath):
+
+def _has_index(link, page_dir, load_path, index_dirs):
+    """
+    Check whether a directory link resolves to a folder with an index.html.
+
+    Args:
+        link: Link value ending with "/", as written in the page
+        page_dir: Site-relative directory of the page containing the link
+        load_path: Root path of the site
+        index_dirs: Output of _site_index_dirs, or None to check the disk
+
+    Returns:
+        bool: True if the target directory has an index.html
+    """
+    if link.startswith('/'):
+        target = link.lstrip('/')
+    else:
+        target = posixpath.join(page_dir, link)
+    key = posixpath.normpath(target)
+    if key == '.':
+        key = ''
+    if index_dirs is not None:
+        return key in index_dirs
+    return (Path(load_path) / key / 'index.html').is_file()
+
+
+def _needs_html_rewrite(data):
+    """True if the HTML contains anything _RE_HTML_REWRITE could match."""
+    # A few memchr-speed finds are cheaper than a regex pass that matches nothing
+    return any(data.find(token) >= 0 for token in _HTML_REWRITE_TOKENS)
+
+
+def process_html_content(data, depth, filepath, load_path, lst_missing_index, relpath, index_dirs=None):
     """
     Process HTML content: fix paths and validate index links.
 
     Args:
-        data: HTML content string
+        data: HTML content bytes (or any buffer, e.g. an mmap)
         depth: Directory depth of the file
         filepath: Path to the HTML file
         load_path: Root path of the site
         lst_missing_index: List to collect missing index warnings
         relpath: Relative path of the file
+        index_dirs: Directories known to contain an index.html (see
+            _site_index_dirs); when None the filesystem is checked
 
     Returns:
-        str: Processed HTML content
+        bytes: Processed HTML content
+    """
+    if not _needs_html_rewrite(data):
+        return bytes(data)
+
+    prefix = _depth_prefix(depth)
+    page_dir = posixpath.dirname(relpath.replace(os.sep, '/'))
+    # Set mirror of lst_missing_index for O(1) duplicate checks
+    seen_missing = set(lst_missing_index)
+
+    def rewrite(match):
+        attr = match.group(1)
+        if attr is None:
+            # Any other root-relative href/src/url( path
+            return match.group(3) + prefix
+
+        link = match.group(2)
+        value = link
+        if value.startswith(b'/'):
+            value = prefix + value[1:]
+        if b'url(/' in value:
+            # A root-relative url( nested inside the value is prefixed too
+            value = value.replace(b'url(/', b'url(' + prefix)
+        if not value.endswith(b'/'):
+            # At depth 0 the rewrite can strip the trailing slash (e.g. a
+            # bare "/"), leaving no directory link to check
+            return attr + value
+
+        link = link.decode('utf-8', errors='replace')
+        if _is_external_link(link):
+            return attr + value
+        if _has_index(link, page_dir, load_path, index_dirs):
+            return attr + value + b'index.html'
+
+        warning_msg = f"{relpath} -> Link '{link}' has no index.html"
+        if warning_msg not in seen_missing:
+            seen_missing.add(warning_msg)
+            lst_missing_index.append(warning_msg)
+        return attr + value
+
+    return _RE_HTML_REWRITE.sub(rewrite, data)
+
+
+def _process_pool(**kwargs):
     """
-    data = data.replace('href="/', 'href="{}'.format("../" * depth))
-    data = data.replace('src="/', 'src="{}'.format("../" * depth))
-    data = data.replace('url(/', 'url({}'.format("../" * depth))
-    data = data.replace('url("/', 'url("{}'.format("../" * depth))
+    Create a process pool for CPU-bound per-file work.
 
-    def check_and_replace_index(match):
-        link = match.group(1)
-        index_path = load_path / link.lstrip('/') / 'index.html'
+    Workers are spawned rather than forked: the ZIM Creator runs its own
+    threads, and forking a threaded process is not safe.
+    """
+    return ProcessPoolExecutor(mp_context=multiprocessing.get_context("spawn"), **kwargs)
 
-        if index_path.exists():
-            return link + '/index.html"'
-        else:
-            warning_msg = f"{relpath} -> Link '{link}/' has no index.html"
-            if warning_msg not in lst_missing_index:
-                lst_missing_index.append(warning_msg)
-            return link + '/"'
 
-    data = re.sub(r'((?:href="|src=")(?:\.\./)*[^"]*/)(?=")', check_and_replace_index, data)
-    return data
+def _scan_file_references(filepath, site_root):
+    """
+    Extract the referenced asset paths from a single HTML or CSS file.
 
+    References are resolved with string operations only (no filesystem
+    access), against the absolute site root.
 
-def find_referenced_assets(all_files, load_path):
-    """
-    Scan all HTML and CSS files to build a set of referenced asset paths.
+    Args:
+        filepath: Path to the HTML or CSS file
+        site_root: Absolute path of the site root, as a string
 
     Returns:
-        set: Relative paths (from load_path) of all referenced assets.
+        set: Relative paths (from the site root) referenced by the file.
     """
     referenced = set()
+    ext = _file_ext(os.fspath(filepath))
+
+    try:
+        with open(filepath, 'rb') as fp:
+            content = fp.read()
+    except Exception:
+        return referenced
+
+    root_prefix = site_root.rstrip(os.sep) + os.sep
+    file_dir = os.path.dirname(os.path.abspath(filepath))
+
+    if ext in _HTML_EXTS:
+        patterns = _HTML_REF_PATTERNS
+    else:
+        patterns = _CSS_REF_PATTERNS
+
+    for pattern in patterns:
+        for match in pattern.finditer(content):
+            raw = match.group(1).decode('utf-8', errors='replace')
+
+            # srcset has comma-separated entries like "img.png 2x, img2.png 3x"
+            if b'srcset' in match.group(0):
+                entries = raw.split(',')
+                refs = [e.strip().split()[0] for e in entries if e.strip()]
+            else:
+                refs = [raw]
 
-    # Patterns to extract references from HTML
-    html_patterns = [
-        re.compile(r'(?:href|src|poster|data-src)=["\']([^"\'#?]+)', re.IGNORECASE),
-        re.compile(r'srcset=["\']([^"\']+)["\']', re.IGNORECASE),
-        re.compile(r'url\(["\']?([^"\')\s#?]+)', re.IGNORECASE),
-    ]
-    # Pattern for CSS url() references
-    css_url_pattern = re.compile(r'url\(["\']?([^"\')\s#?]+)', re.IGNORECASE)
-
-    for filepath in all_files:
-        ext = filepath.suffix.lower()
-        if ext not in ('.html', '.htm', '.css'):
-            continue
+            for ref in refs:
+                ref = ref.strip()
+                # Skip external URLs, data URIs, anchors, empty
+                if not ref or ref.startswith(('http://', 'https://', '//', 'data:', 'mailto:', '#', 'javascript:')):
+                    continue
 
-        try:
-            content = filepath.read_text(encoding='utf-8', errors='replace')
-        except Exception:
-            continue
+                # Resolve the reference relative to the file's directory
+                if ref.startswith('/'):
+                    resolved = os.path.normpath(os.path.join(site_root, ref.lstrip('/')))
+                else:
+                    resolved = os.path.normpath(os.path.join(file_dir, ref))
 
-        file_dir = filepath.parent
+                if not resolved.startswith(root_prefix):
+                    # Outside the site directory
+                    continue
+                relpath = resolved[len(root_prefix):]
 
-        if ext in ('.html', '.htm'):
-            patterns = html_patterns
-        else:
-            patterns = [css_url_pattern]
+                referenced.add(relpath)
 
-        for pattern in patterns:
-            for match in pattern.finditer(content):
-                raw = match.group(1)
+                # If it's a directory-like reference, also add index.html
+                if relpath.endswith('/') or not os.path.splitext(relpath)[1]:
+                    referenced.add(relpath.rstrip('/') + '/index.html')
 
-                # srcset has comma-separated entries like "img.png 2x, img2.png 3x"
-                if 'srcset' in (match.group(0) or ''):
-                    entries = raw.split(',')
-                    refs = [e.strip().split()[0] for e in entries if e.strip()]
-                else:
-                    refs = [raw]
+    return referenced
 
-                for ref in refs:
-                    ref = ref.strip()
-                    # Skip external URLs, data URIs, anchors, empty
-                    if not ref or ref.startswith(('http://', 'https://', '//', 'data:', 'mailto:', '#', 'javascript:')):
-                        continue
 
-                    # Resolve the reference relative to the file's directory
-                    if ref.startswith('/'):
-                        resolved = load_path / ref.lstrip('/')
-                    else:
-                        resolved = (file_dir / ref).resolve()
+def find_referenced_assets(all_files, load_path):
+    """
+    Scan all HTML and CSS files to build a set of referenced asset paths.
 
-                    try:
-                        relpath = str(resolved.relative_to(load_path.resolve()))
-                    except ValueError:
-                        # Outside the site directory
-                        continue
+    Files are scanned in parallel worker processes.
 
-                    referenced.add(relpath)
+    Returns:
+        set: Relative paths (from load_path) of all referenced assets.
+    """
+    referenced = set()
+    text_files = [f for f in all_files if _file_ext(os.fspath(f)) in _TEXT_EXTS]
+    if not text_files:
+        return referenced
 
-                    # If it's a directory-like reference, also add index.html
-                    if relpath.endswith('/') or not Path(relpath).suffix:
-                        referenced.add(relpath.rstrip('/') + '/index.html')
+    with _process_pool() as executor:
+        for refs in executor.map(_scan_file_references, text_files, repeat(os.path.abspath(load_path)),
+                                 chunksize=WORKER_CHUNKSIZE):
+            referenced.update(refs)
 
     return referenced
 
@@ -146,12 +421,13 @@ def cleanup_unreferenced(all_files, load_path, logger):
     filtered = []
     removed = []
 
+    root_prefix = _root_prefix(load_path)
     for filepath in all_files:
-        relpath = str(filepath.relative_to(load_path))
-        ext = filepath.suffix.lower()
+        relpath = _relpath(filepath, load_path, root_prefix)
+        ext = _file_ext(relpath)
 
         # Always keep HTML/CSS files
-        if ext in ('.html', '.htm', '.css'):
+        if ext in _TEXT_EXTS:
             filtered.append(filepath)
             continue
 
@@ -165,15 +441,31 @@ def cleanup_unreferenced(all_files, load_path, logger):
         logger.info(f"Cleanup: removing {len(removed)} unreferenced assets")
         if logger.isEnabledFor(logging.DEBUG):
             for r in removed:
-                logger.debug(f"  Unreferenced: {r}")
+                logger.debug("  Unreferenced: %s", r)
 
     return filtered, len(removed)
 
 
+def _optimized_sizes(filepath, relpath, max_width, quality, cache_dir):
+    """
+    Run optimize_image in a worker and return only (orig_size, new_size).
+
+    The cache is only read: a dry run leaves no encoded images behind.
+    """
+    result = optimize_image(filepath, max_width, quality, cache_dir, relpath, update_cache=False)
+    if not result:
+        return None
+    _, orig_size, new_size = result
+    return orig_size, new_size
+
+
 def process_dry_run(all_files, load_path, args, lst_unknown, lst_missing_index, lst_errors, url_mapping=None):
     """
     Analyze files without creating ZIM (dry-run mode).
 
+    Image optimization estimates run in parallel worker processes while
+    the remaining files are scanned.
+
     Args:
         all_files: List of all files to process
         load_path: Root path of the site
@@ -187,50 +479,235 @@ def process_dry_run(all_files, load_path, args, lst_unknown, lst_missing_index,
     """
     images_optimized = 0
     bytes_saved = 0
+    # Set mirror of lst_missing_index for O(1) duplicate checks
+    seen_missing = set(lst_missing_index)
+    index_dirs = _site_index_dirs(all_files, load_path)
+    root_prefix = _root_prefix(load_path)
 
     use_progress_bar = TQDM_AVAILABLE and not args.no_progress and not args.quiet and not args.verbose
     file_iterator = tqdm(all_files, desc="Analyzing", unit="file") if use_progress_bar else all_files
 
-    for filepath in file_iterator:
-        relpath = str(filepath.relative_to(load_path))
-        ext = filepath.suffix.lstrip(".").lower()
+    # Image optimization is the CPU-heavy part of the analysis: submit it to
+    # worker processes and keep scanning while they run
+    executor = _process_pool() if args.optimize_images else None
+    image_jobs = []
 
-        if args.verbose:
-            logging.debug(f"Analyzing: {relpath}")
+    try:
+        for filepath in file_iterator:
+            relpath = _relpath(filepath, load_path, root_prefix)
+            ext = _file_ext(relpath)
 
-        try:
-            if ext not in MIME_TYPES and not (str(filepath).endswith(".html") or str(filepath).endswith(".htm")):
-                lst_unknown.append(ext)
+            if args.verbose:
+                logging.debug("Analyzing: %s", relpath)
 
-            if str(filepath).endswith(".html") or str(filepath).endswith(".htm"):
-                with open(filepath, "r", encoding="utf-8", errors="replace") as fp:
-                    data = fp.read()
-                    links = re.findall(r'href="([^"]+/)"', data)
+            try:
+                is_html = ext in _HTML_EXTS
+                if ext not in MIME_EXTENSIONS and not is_html:
+                    lst_unknown.append(ext)
+
+                if is_html:
+                    page_dir = posixpath.dirname(relpath.replace(os.sep, '/'))
+                    with _html_source(filepath) as data:
+                        links = _RE_HREF_DIR.findall(data)
                     for link in links:
-                        index_path = load_path / link.lstrip('/') / 'index.html'
-                        if not index_path.exists():
+                        link = link.decode('utf-8', errors='replace')
+                        if _is_external_link(link):
+                            continue
+                        if not _has_index(link, page_dir, load_path, index_dirs):
                             warning_msg = f"{relpath} -> Link '{link}' has no index.html"
-                            if warning_msg not in lst_missing_index:
+                            if warning_msg not in seen_missing:
+                                seen_missing.add(warning_msg)
                                 lst_missing_index.append(warning_msg)
 
-            if args.optimize_images and ext in ['jpg', 'jpeg', 'png']:
-                result = optimize_image(filepath, args.max_image_width, args.image_quality)
-                if result:
-                    _, orig_size, new_size = result
-                    images_optimized += 1
-                    bytes_saved += (orig_size - new_size)
-
-        except Exception as e:
-            logging.error(f"Failed to analyze {filepath}: {e}")
-            lst_errors.append(f"{relpath} ({type(e).__name__})")
+                if executor is not None and ext in _IMAGE_EXTS:
+                    future = executor.submit(_optimized_sizes, filepath, relpath, args.max_image_width,
+                                             args.image_quality, args.image_cache_dir)
+                    image_jobs.append((filepath, relpath, future))
+
+            except Exception as e:
+                logging.error(f"Failed to analyze {filepath}: {e}")
+                lst_errors.append(f"{relpath} ({type(e).__name__})")
+
+        for filepath, relpath, future in image_jobs:
+            try:
+                sizes = future.result()
+            except Exception as e:
+                logging.error(f"Failed to analyze {filepath}: {e}")
+                lst_errors.append(f"{relpath} ({type(e).__name__})")
+                continue
+            if sizes:
+                orig_size, new_size = sizes
+                images_optimized += 1
+                bytes_saved += (orig_size - new_size)
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
 
     return images_optimized, bytes_saved
 
 
+# Per-process state for _prepare_file, set by _init_worker
+_worker_state = {}
+
+
+def _init_worker(load_path, args, url_mapping, index_dirs):
+    """Initialize a process_files worker with the run-wide settings."""
+    setup_logging(verbose=args.verbose, quiet=args.quiet)
+    _worker_state['load_path'] = load_path
+    _worker_state['index_dirs'] = index_dirs
+    _worker_state['root_prefix'] = _root_prefix(load_path)
+    _worker_state['args'] = args
+    _worker_state['url_mapping'] = compile_url_mapping(url_mapping)
+
+
+def _prefetch(path):
+    """
+    Ask the kernel to start reading a file into the page cache.
+
+    Files added through FileProvider are read later by libzim; issuing the
+    read-ahead from the workers (which run ahead of the writer) overlaps
+    that disk I/O with compression. No-op where posix_fadvise is missing.
+    """
+    if not hasattr(os, 'posix_fadvise'):
+        return
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def _prepare_file(filepath):
+    """
+    Compute the ZIM entry for one file (runs in a worker process).
+
+    Image optimization and HTML/CSS rewriting happen here so they run in
+    parallel; the main process only creates the items and adds them.
+
+    Args:
+        filepath: Path to the file
+
+    Returns:
+        dict: Entry fields (relpath, title, mimetype, content, fpath), plus
+        the missing index warnings, unknown extension, optimization sizes
+        and error (log message, report entry) found for this file
+    """
+    load_path = _worker_state['load_path']
+    args = _worker_state['args']
+    url_mapping = _worker_state['url_mapping']
+    root_prefix = _worker_state['root_prefix']
+
+    # Derive everything from the path string once, without pathlib
+    fp_str = os.fspath(filepath)
+    relpath = _relpath(filepath, load_path, root_prefix)
+    depth = relpath.count("/")
+    title, ext = os.path.splitext(os.path.basename(fp_str))
+    ext = ext[1:].lower()
+    mime = MIME_TYPES.get(ext)
+    result = {
+        'relpath': relpath,
+        'title': title,
+        'mimetype': "text/html",
+        'content': "",
+        'fpath': None,
+        'missing_index': [],
+        'unknown': None,
+        'optimized': None,
+        'error': None,
+    }
+
+    if args.verbose:
+        logging.debug("Depth: %d \t%s", depth, relpath)
+
+    try:
+        if mime is not None:
+            result['mimetype'] = mime
+            result['fpath'] = fp_str
+
+            if args.optimize_images and ext in _IMAGE_EXTS:
+                optimized = optimize_image(filepath, args.max_image_width, args.image_quality,
+                                           args.image_cache_dir, relpath)
+                if optimized:
+                    optimized_data, orig_size, new_size = optimized
+                    result['content'] = optimized_data
+                    result['fpath'] = None
+                    result['optimized'] = (orig_size, new_size)
+                    if args.verbose:
+                        logging.debug("Optimized %s: %d -> %d bytes", relpath, orig_size, new_size)
+            elif url_mapping and ext == 'css':
+                try:
+                    with open(fp_str, 'rb') as fp:
+                        css_data = fp.read()
+                    result['content'] = replace_external_urls(css_data, url_mapping, depth)
+                    result['fpath'] = None
+                except Exception as e:
+                    logging.warning(f"CSS rewrite failed for {relpath}, using original: {e}")
+
+        elif ext in _HTML_EXTS:
+            with _html_source(fp_str) as source:
+                if not url_mapping and not _needs_html_rewrite(source):
+                    # Nothing to rewrite: libzim reads the file itself
+                    result['fpath'] = fp_str
+                else:
+                    data = process_html_content(source, depth, filepath, load_path, result['missing_index'],
+                                                relpath, _worker_state['index_dirs'])
+                    if url_mapping:
+                        data = replace_external_urls(data, url_mapping, depth)
+                    result['content'] = data
+
+        else:
+            logging.debug("Unknown mimetype: %s", relpath)
+            result['unknown'] = ext
+            result['mimetype'] = guess_mime_type(ext)
+            result['fpath'] = fp_str
+
+    except PermissionError:
+        result['error'] = (f"Permission denied reading file: {filepath}", f"{relpath} (Permission denied)")
+    except UnicodeDecodeError as e:
+        result['error'] = (f"Encoding error in file {filepath}: {e}", f"{relpath} (Encoding error)")
+    except Exception as e:
+        result['error'] = (f"Failed to process file {filepath}: {e}", f"{relpath} ({type(e).__name__})")
+
+    if result['fpath'] is not None:
+        _prefetch(result['fpath'])
+
+    return result
+
+
+def _prepare_batch(filepaths):
+    """Run _prepare_file on a batch of files (one worker round-trip)."""
+    return [_prepare_file(filepath) for filepath in filepaths]
+
+
+def _iter_prepared(executor, all_files, max_pending):
+    """
+    Yield _prepare_file results in file order, with a bounded work-ahead window.
+
+    At most max_pending batches are submitted but not yet consumed, so
+    workers run ahead of the caller without buffering the whole site.
+    """
+    pending = deque()
+    for start in range(0, len(all_files), WORKER_CHUNKSIZE):
+        pending.append(executor.submit(_prepare_batch, all_files[start:start + WORKER_CHUNKSIZE]))
+        if len(pending) >= max_pending:
+            yield from pending.popleft().result()
+    while pending:
+        yield from pending.popleft().result()
+
+
 def process_files(creator, all_files, load_path, args, lst_unknown, lst_missing_index, lst_errors, url_mapping=None):
     """
     Process all files and add them to ZIM archive.
 
+    File contents are prepared in parallel worker processes, a bounded
+    number of batches ahead; items are added to the creator from this
+    process, in file order.
+
     Args:
         creator: ZIM Creator instance
         all_files: List of all files to process
@@ -245,70 +722,46 @@ def process_files(creator, all_files, load_path, args, lst_unknown, lst_missing_
     """
     images_optimized = 0
     bytes_saved = 0
+    # Set mirror of lst_missing_index for O(1) duplicate checks
+    seen_missing = set(lst_missing_index)
 
     use_progress_bar = TQDM_AVAILABLE and not args.no_progress and not args.quiet and not args.verbose
-    file_iterator = tqdm(all_files, desc="Processing", unit="file") if use_progress_bar else all_files
 
-    for filepath in file_iterator:
-        relpath = str(filepath.relative_to(load_path))
-        depth = relpath.count("/")
-        title = filepath.stem
-        ext = filepath.suffix.lstrip(".").lower()
-
-        if args.verbose:
-            logging.debug(f"Depth: {depth} \t{relpath}")
-
-        try:
-            if ext in MIME_TYPES:
-                mime = MIME_TYPES[ext]
-
-                if args.optimize_images and ext in ['jpg', 'jpeg', 'png']:
-                    result = optimize_image(filepath, args.max_image_width, args.image_quality)
-                    if result:
-                        optimized_data, orig_size, new_size = result
-                        images_optimized += 1
-                        bytes_saved += (orig_size - new_size)
-                        item = MyItem(title=title, path=relpath, content=optimized_data, mimetype=mime)
-                        if args.verbose:
-                            logging.debug(f"Optimized {relpath}: {orig_size} -> {new_size} bytes")
-                    else:
-                        item = MyItem(title=title, path=relpath, fpath=str(filepath), mimetype=mime)
-                elif url_mapping and ext == 'css':
-                    try:
-                        with open(filepath, 'r', encoding='utf-8', errors='replace') as fp:
-                            css_data = fp.read()
-                        css_data = replace_external_urls(css_data, url_mapping, depth)
-                        item = MyItem(title=title, path=relpath, content=css_data, mimetype=mime)
-                    except Exception as e:
-                        logging.warning(f"CSS rewrite failed for {relpath}, using original: {e}")
-                        item = MyItem(title=title, path=relpath, fpath=str(filepath), mimetype=mime)
-                else:
-                    item = MyItem(title=title, path=relpath, fpath=str(filepath), mimetype=mime)
-
-            elif str(filepath).endswith(".html") or str(filepath).endswith(".htm"):
-                with open(filepath, "r", encoding="utf-8", errors="replace") as fp:
-                    data = fp.read()
-
-                data = process_html_content(data, depth, filepath, load_path, lst_missing_index, relpath)
-                if url_mapping:
-                    data = replace_external_urls(data, url_mapping, depth)
-                item = MyItem(title=title, path=relpath, content=data)
-
-            else:
-                logging.debug(f"Unknown mimetype: {relpath}")
-                lst_unknown.append(relpath.rsplit(".", 1)[-1])
-                item = MyItem(title=title, path=relpath, fpath=str(filepath))
-
-            creator.add_item(item)
-
-        except PermissionError:
-            logging.error(f"Permission denied reading file: {filepath}")
-            lst_errors.append(f"{relpath} (Permission denied)")
-        except UnicodeDecodeError as e:
-            logging.error(f"Encoding error in file {filepath}: {e}")
-            lst_errors.append(f"{relpath} (Encoding error)")
-        except Exception as e:
-            logging.error(f"Failed to process file {filepath}: {e}")
-            lst_errors.append(f"{relpath} ({type(e).__name__})")
+    workers = os.cpu_count() or 1
+    with _process_pool(max_workers=workers, initializer=_init_worker,
+                       initargs=(load_path, args, url_mapping,
+                                 _site_index_dirs(all_files, load_path))) as executor:
+        results = zip(all_files, _iter_prepared(executor, all_files, workers * WORKER_AHEAD))
+        if use_progress_bar:
+            results = tqdm(results, total=len(all_files), desc="Processing", unit="file")
+
+        for filepath, result in results:
+            for warning_msg in result['missing_index']:
+                if warning_msg not in seen_missing:
+                    seen_missing.add(warning_msg)
+                    lst_missing_index.append(warning_msg)
+            if result['unknown'] is not None:
+                lst_unknown.append(result['unknown'])
+
+            if result['error'] is not None:
+                log_msg, error_entry = result['error']
+                logging.error(log_msg)
+                lst_errors.append(error_entry)
+                continue
+
+            if result['optimized'] is not None:
+                orig_size, new_size = result['optimized']
+                images_optimized += 1
+                bytes_saved += (orig_size - new_size)
+
+            # Results arrive unpickled, each with its own mimetype string;
+            # interning shares one per type across the items libzim holds
+            item = MyItem(title=result['title'], path=result['relpath'], content=result['content'],
+                          fpath=result['fpath'], mimetype=sys.intern(result['mimetype']))
+            try:
+                creator.add_item(item)
+            except Exception as e:
+                logging.error(f"Failed to process file {filepath}: {e}")
+                lst_errors.append(f"{result['relpath']} ({type(e).__name__})")
 
     return images_optimized, bytes_saved
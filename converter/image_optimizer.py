@@ -2,7 +2,10 @@
 Image optimization utilities for reducing ZIM file size.
 """
 
+import hashlib
 import logging
+import os
+from io import BytesIO
 
 try:
     from PIL import Image
@@ -10,57 +13,243 @@ try:
 except ImportError:
     PILLOW_AVAILABLE = False
 
+# libvips (via pyvips) resizes with SIMD and streams the image instead of
+# decoding it fully; preferred over Pillow when installed
+try:
+    import pyvips
+    PYVIPS_AVAILABLE = True
+    # pyvips forwards libvips' GLib INFO chatter (per-operation reduce/mask
+    # details) to this logger; workers log at INFO, so keep it to warnings
+    logging.getLogger('pyvips').setLevel(logging.WARNING)
+except (ImportError, OSError):
+    # pyvips raises OSError when the libvips shared library is missing
+    PYVIPS_AVAILABLE = False
+
+# Images smaller than this are left untouched
+MIN_OPTIMIZE_SIZE = 50 * 1024
+
+# JPEG decoders can scale by 1/2, 1/4 or 1/8 while decoding; a downscaled
+# image is decoded at the smallest scale that still leaves this factor over
+# the target width for the final Lanczos pass
+JPEG_SHRINK_MARGIN = 2
+
+# Suffix of the per-image entries in the optimization cache directory
+CACHE_SUFFIX = '.bin'
+# Seconds of slack when pruning, for filesystems with coarse timestamps
+CACHE_MTIME_SLACK = 2
+# Part of every cache key; bump when the encoding settings change so
+# entries written by an older version are not reused
+CACHE_VERSION = 2
+
+
+def _jpeg_shrink(width, max_width):
+    """Largest decode-time shrink factor (1, 2, 4 or 8) for a JPEG of this width."""
+    for shrink in (8, 4, 2):
+        if width // shrink >= max_width * JPEG_SHRINK_MARGIN:
+            return shrink
+    return 1
+
+
+def _optimize_with_vips(image_path, max_width, quality, original_size):
+    """
+    Optimize a JPEG or PNG image with libvips.
 
-def optimize_image(image_path, max_width=1920, quality=85):
+    Same contract as _optimize_image().
+    """
+    img = pyvips.Image.new_from_file(str(image_path), access='sequential')
+    loader = img.get('vips-loader')
+    if not loader.startswith(('jpeg', 'png')):
+        return None
+
+    if loader.startswith('jpeg'):
+        # Shrink-on-load: the first load only read the header
+        shrink = _jpeg_shrink(img.width, max_width)
+        if shrink > 1:
+            img = pyvips.Image.new_from_file(str(image_path), access='sequential', shrink=shrink)
+
+    if img.width > max_width:
+        img = img.resize(max_width / img.width, kernel='lanczos3')
+
+    if loader.startswith('jpeg'):
+        data = img.write_to_buffer('.jpg', Q=quality, optimize_coding=True, interlace=True)
+    else:
+        data = img.write_to_buffer('.png', compression=9)
+
+    return (data, original_size, len(data))
+
+
+def _cache_file(cache_dir, relpath, st, max_width, quality):
+    """Return the cache entry path for one image version and set of settings."""
+    backend = 'vips' if PYVIPS_AVAILABLE else 'pil'
+    key = f"{relpath}|{st.st_mtime_ns}|{st.st_size}|{max_width}|{quality}|{backend}|{CACHE_VERSION}"
+    digest = hashlib.blake2b(key.encode(), digest_size=16).hexdigest()
+    return os.path.join(cache_dir, digest + CACHE_SUFFIX)
+
+
+def _write_cache_file(cache_file, data):
+    """Atomically store a cache entry; concurrent workers may write the same one."""
+    tmp_file = f"{cache_file}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_file, 'wb') as fp:
+            fp.write(data)
+        os.replace(tmp_file, cache_file)
+    except OSError as e:
+        logging.debug("Failed to write optimization cache %s: %s", cache_file, e)
+        try:
+            os.unlink(tmp_file)
+        except OSError:
+            pass
+
+
+def optimize_image(image_path, max_width=1920, quality=85, cache_dir=None, relpath=None, update_cache=True):
     """
     Optimize image by resizing and compressing.
 
+    Uses libvips when pyvips is installed, Pillow otherwise. Files under
+    MIN_OPTIMIZE_SIZE are skipped without being opened. PNGs that need no
+    resize are still re-encoded, as optimize=True often shrinks them. With a
+    cache_dir, results are stored there keyed on the file's path within
+    the site, mtime and size plus the settings, so a later build reuses
+    them instead of re-encoding. Images the optimizer cannot shrink are
+    cached as empty entries. Entries used are touched, so a build can
+    drop the rest with prune_image_cache().
+
     Args:
         image_path: Path to image file
         max_width: Maximum width for resizing
         quality: JPEG quality (1-100)
+        cache_dir: Optional directory for the persistent optimization cache
+        relpath: Path relative to the site root, for the cache key
+            (defaults to image_path)
+        update_cache: If False, only read from the cache (dry-run)
 
     Returns:
         tuple: (optimized_data, original_size, new_size) or None if failed/not needed
     """
-    if not PILLOW_AVAILABLE:
+    if not (PYVIPS_AVAILABLE or PILLOW_AVAILABLE):
         return None
 
+    # Cheap check before any decoder is involved: most images stop here
     try:
-        with Image.open(image_path) as img:
-            original_size = image_path.stat().st_size
+        st = os.stat(image_path)
+        if st.st_size < MIN_OPTIMIZE_SIZE:
+            return None
+    except OSError as e:
+        logging.debug("Failed to optimize image %s: %s", image_path, e)
+        return None
 
-            if original_size < 50 * 1024:
-                return None
+    cache_file = None
+    if cache_dir is not None:
+        cache_file = _cache_file(cache_dir, relpath or image_path, st, max_width, quality)
+        try:
+            with open(cache_file, 'rb') as fp:
+                data = fp.read()
+        except OSError:
+            pass
+        else:
+            if update_cache:
+                # Mark the entry as used by this run (see prune_image_cache)
+                try:
+                    os.utime(cache_file)
+                except OSError:
+                    pass
+            return (data, st.st_size, len(data)) if data else None
 
-            if img.width > max_width:
-                ratio = max_width / img.width
-                new_height = int(img.height * ratio)
-                img = img.resize((max_width, new_height), Image.Resampling.LANCZOS)
+    try:
+        result = _optimize_image(image_path, max_width, quality, st.st_size)
+    except Exception as e:
+        # Never cached: the failure may be transient (MemoryError, libvips error)
+        logging.debug("Failed to optimize image %s: %s", image_path, e)
+        return None
 
-            from io import BytesIO
-            output = BytesIO()
+    if result is None:
+        return None
+
+    # Only a completed encode that did not shrink the file is cached as negative
+    if result[2] >= st.st_size:
+        result = None
+    if cache_file is not None and update_cache:
+        _write_cache_file(cache_file, result[0] if result else b'')
+    return result
 
-            fmt = img.format or 'PNG'
-            if fmt == 'JPEG' or fmt == 'JPG':
-                img.save(output, format='JPEG', quality=quality, optimize=True)
-            elif fmt == 'PNG':
-                img.save(output, format='PNG', optimize=True)
-            else:
-                return None
 
-            new_size = output.tell()
+def prune_image_cache(cache_dir, since):
+    """
+    Delete optimization cache entries not used since a given time.
 
-            if new_size < original_size:
-                return (output.getvalue(), original_size, new_size)
+    Run after a build: entries for edited or removed images, or for other
+    quality/max-width settings, would otherwise accumulate forever.
+
+    Args:
+        cache_dir: Optimization cache directory
+        since: Start time of the build (seconds since the epoch)
+
+    Returns:
+        int: Number of entries removed
+    """
+    cutoff = since - CACHE_MTIME_SLACK
+    removed = 0
+    try:
+        entries = os.scandir(cache_dir)
+    except OSError as e:
+        logging.debug("Failed to prune optimization cache %s: %s", cache_dir, e)
+        return 0
+    with entries:
+        for entry in entries:
+            # Stale entries, and temporary files left by interrupted writes
+            if not entry.name.endswith((CACHE_SUFFIX, '.tmp')):
+                continue
+            try:
+                if entry.stat().st_mtime < cutoff:
+                    os.unlink(entry.path)
+                    removed += 1
+            except OSError as e:
+                logging.debug("Failed to prune optimization cache entry %s: %s", entry.path, e)
+    return removed
+
+
+def _optimize_image(image_path, max_width, quality, original_size):
+    """
+    Encode a file already past optimize_image()'s size checks.
 
+    Returns:
+        tuple: (encoded_data, original_size, new_size), even when the output
+        is not smaller, or None for formats other than JPEG and PNG.
+        Decoder and encoder errors propagate to the caller.
+    """
+    if PYVIPS_AVAILABLE:
+        return _optimize_with_vips(image_path, max_width, quality, original_size)
+
+    # Opening only parses the header; pixels are decoded on resize/save
+    with Image.open(image_path) as img:
+        # Read the format before resizing: resized images have none
+        fmt = img.format
+        if fmt not in ('JPEG', 'PNG'):
             return None
 
-    except Exception as e:
-        logging.debug(f"Failed to optimize image {image_path}: {e}")
-        return None
+        if img.width > max_width:
+            ratio = max_width / img.width
+            new_height = int(img.height * ratio)
+            if fmt == 'JPEG':
+                # Let libjpeg downscale while decoding (see _jpeg_shrink)
+                img.draft(img.mode, (max_width * JPEG_SHRINK_MARGIN, new_height * JPEG_SHRINK_MARGIN))
+            img = img.resize((max_width, new_height), Image.Resampling.LANCZOS)
+
+        output = BytesIO()
+        if fmt == 'JPEG':
+            # Progressive JPEGs are typically a few percent smaller
+            img.save(output, format='JPEG', quality=quality, optimize=True, progressive=True)
+        else:
+            img.save(output, format='PNG', optimize=True)
+
+        return (output.getvalue(), original_size, output.tell())
 
 
 def is_pillow_available():
     """Check if Pillow library is available."""
     return PILLOW_AVAILABLE
+
+
+def is_optimizer_available():
+    """Check if an image optimization backend (libvips or Pillow) is available."""
+    return PYVIPS_AVAILABLE or PILLOW_AVAILABLE
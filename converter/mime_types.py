@@ -4,6 +4,9 @@ MIME type mappings for common file extensions.
 Source: https://developer.mozilla.org/fr/docs/Web/HTTP/MIME_types/Common_types
 """
 
+import mimetypes
+from functools import lru_cache
+
 MIME_TYPES = {
     "bin": "application/octet-stream",
     "bmp": "image/bmp",
@@ -53,6 +56,12 @@ MIME_TYPES = {
     "zip": "application/zip",
 }
 
+# Known extensions, for fast membership tests
+MIME_EXTENSIONS = frozenset(MIME_TYPES)
+
+# MIME type for extensions neither table nor system database knows
+DEFAULT_MIME_TYPE = "application/octet-stream"
+
 
 def get_mime_type(extension):
     """
@@ -65,3 +74,22 @@ def get_mime_type(extension):
         str: MIME type or None if not found
     """
     return MIME_TYPES.get(extension.lower())
+
+
+@lru_cache(maxsize=256)
+def guess_mime_type(extension):
+    """
+    Get MIME type for any file extension, falling back to the system database.
+
+    Extensions missing from MIME_TYPES are looked up with
+    mimetypes.guess_type(); results are cached per extension.
+
+    Args:
+        extension: File extension (without dot, lowercase)
+
+    Returns:
+        str: MIME type, DEFAULT_MIME_TYPE if nothing matches
+    """
+    return (MIME_TYPES.get(extension)
+            or mimetypes.guess_type("x." + extension, strict=False)[0]
+            or DEFAULT_MIME_TYPE)
@@ -3,24 +3,18 @@ HTML report generation for ZIM conversion validation.
 """
 
 import logging
+from collections import Counter
 from datetime import datetime
+from html import escape
 from pathlib import Path
 
+# Write buffer for the report file; large reports are flushed in few writes
+REPORT_BUFFER_SIZE = 1 << 20
 
-def generate_link_validation_report(lst_missing_index, lst_unknown, lst_errors, output_path):
-    """
-    Generate an HTML report of link validation issues.
-
-    Args:
-        lst_missing_index: List of missing index page warnings
-        lst_unknown: List of unknown file extensions
-        lst_errors: List of processing errors
-        output_path: Directory to save the report
 
-    Returns:
-        Path: Path to generated report or None if failed
-    """
-    html_content = """<!DOCTYPE html>
+# Static report markup, kept free of str.format placeholders so the CSS
+# braces need no escaping and the template is never rescanned
+_REPORT_HEAD = """<!DOCTYPE html>
 <html lang="en">
 <head>
     <meta charset="UTF-8">
@@ -49,71 +43,112 @@ def generate_link_validation_report(lst_missing_index, lst_unknown, lst_errors,
         <h1>ZIM Conversion Report</h1>
 
         <div class="summary">
-            <div class="stat-box warning">
-                <div class="stat-number">{missing_links_count}</div>
-                <div class="stat-label">Missing Index Pages</div>
-            </div>
-            <div class="stat-box warning">
-                <div class="stat-number">{unknown_mime_count}</div>
-                <div class="stat-label">Unknown MIME Types</div>
-            </div>
-            <div class="stat-box error">
-                <div class="stat-number">{errors_count}</div>
-                <div class="stat-label">Processing Errors</div>
-            </div>
-        </div>
+"""
 
-        {missing_section}
-        {mime_section}
-        {error_section}
+_REPORT_MID = """        </div>
+"""
 
-        <div class="timestamp">Generated: {timestamp}</div>
-    </div>
+_REPORT_TAIL = """    </div>
 </body>
 </html>"""
 
-    missing_section = ""
-    if lst_missing_index:
-        items = "\n".join([f'<div class="issue-item">{item}</div>' for item in lst_missing_index])
-        missing_section = f"""
-        <h2>Missing Index Pages ({len(lst_missing_index)})</h2>
-        <p>Links ending with <code>/</code> but no <code>index.html</code> file found:</p>
-        <div class="issue-list">{items}</div>
-        """
-
-    mime_section = ""
-    if lst_unknown:
-        unique_unknown = sorted(set(lst_unknown))
-        items = "\n".join([f'<div class="issue-item"><code>.{ext}</code></div>' for ext in unique_unknown])
-        mime_section = f"""
-        <h2>Unknown MIME Types ({len(unique_unknown)})</h2>
-        <p>File extensions without registered MIME types (treated as HTML):</p>
-        <div class="issue-list">{items}</div>
-        """
-
-    error_section = ""
-    if lst_errors:
-        items = "\n".join([f'<div class="issue-item error-item">{item}</div>' for item in lst_errors])
-        error_section = f"""
-        <h2>Processing Errors ({len(lst_errors)})</h2>
-        <p>Files that failed to process:</p>
-        <div class="issue-list">{items}</div>
-        """
-
-    html_content = html_content.format(
-        missing_links_count=len(lst_missing_index),
-        unknown_mime_count=len(set(lst_unknown)),
-        errors_count=len(lst_errors),
-        missing_section=missing_section,
-        mime_section=mime_section,
-        error_section=error_section,
-        timestamp=datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    )
+
+def _stat_box(count, label, kind):
+    """Render one summary counter box."""
+    return f"""            <div class="stat-box {kind}">
+                <div class="stat-number">{count}</div>
+                <div class="stat-label">{label}</div>
+            </div>
+"""
+
+
+def _extension_label(ext):
+    """Render an unknown extension, with a readable label for files without one."""
+    if not ext:
+        return "(no extension)"
+    return f"<code>.{escape(ext, quote=False)}</code>"
+
+
+def _write_issue_section(fp, heading, intro, items):
+    """
+    Stream one issue section to the report file.
+
+    Args:
+        fp: Open text file of the report
+        heading: Section heading text
+        intro: Introductory paragraph (may contain markup)
+        items: Iterable of rendered issue-item elements
+    """
+    fp.write(f"""
+        <h2>{heading}</h2>
+        <p>{intro}</p>
+        <div class="issue-list">""")
+    for item in items:
+        fp.write("\n")
+        fp.write(item)
+    fp.write("\n        </div>")
+
+
+def generate_link_validation_report(lst_missing_index, lst_unknown, lst_errors, output_path):
+    """
+    Generate an HTML report of link validation issues.
+
+    The report is written to disk piece by piece, so sites with thousands
+    of warnings never build the whole document in memory. Paths and
+    extensions come from the site and are HTML-escaped.
+
+    Args:
+        lst_missing_index: List of missing index page warnings
+        lst_unknown: List of unknown file extensions
+        lst_errors: List of processing errors
+        output_path: Directory to save the report
+
+    Returns:
+        Path: Path to generated report or None if failed
+    """
+    unknown_counts = sorted(Counter(lst_unknown).items())
 
     report_path = Path(output_path) / "conversion_report.html"
     try:
-        with open(report_path, 'w', encoding='utf-8') as f:
-            f.write(html_content)
+        with open(report_path, 'w', encoding='utf-8', buffering=REPORT_BUFFER_SIZE) as fp:
+            fp.write(_REPORT_HEAD)
+            fp.write(_stat_box(len(lst_missing_index), "Missing Index Pages", "warning"))
+            fp.write(_stat_box(len(unknown_counts), "Unknown MIME Types", "warning"))
+            fp.write(_stat_box(len(lst_errors), "Processing Errors", "error"))
+            fp.write(_REPORT_MID)
+
+            fp.write("\n        ")
+            if lst_missing_index:
+                _write_issue_section(
+                    fp,
+                    f"Missing Index Pages ({len(lst_missing_index)})",
+                    "Links ending with <code>/</code> but no <code>index.html</code> file found:",
+                    (f'<div class="issue-item">{escape(item, quote=False)}</div>' for item in lst_missing_index),
+                )
+            fp.write("\n        ")
+            if unknown_counts:
+                _write_issue_section(
+                    fp,
+                    f"Unknown MIME Types ({len(unknown_counts)})",
+                    "File extensions without registered MIME types (guessed from the system database, else <code>application/octet-stream</code>):",
+                    (f'<div class="issue-item">{_extension_label(ext)} '
+                     f'({count} file{"s" if count > 1 else ""})</div>'
+                     for ext, count in unknown_counts),
+                )
+            fp.write("\n        ")
+            if lst_errors:
+                _write_issue_section(
+                    fp,
+                    f"Processing Errors ({len(lst_errors)})",
+                    "Files that failed to process:",
+                    (f'<div class="issue-item error-item">{escape(item, quote=False)}</div>' for item in lst_errors),
+                )
+
+            fp.write(f"""
+
+        <div class="timestamp">Generated: {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}</div>
+""")
+            fp.write(_REPORT_TAIL)
         return report_path
     except Exception as e:
         logging.error(f"Failed to generate report: {e}")
@@ -2,7 +2,17 @@
 Validation and sanitization functions for ZIM metadata and filenames.
 """
 
+import re
+from functools import lru_cache
 
+# Characters not allowed in ZIM filenames
+_INVALID_FILENAME_RE = re.compile(r'[<>:"/\\|?*]')
+
+# Spaces become dashes, filesystem-invalid characters are dropped
+_SANITIZE_TABLE = str.maketrans({' ': '-', **dict.fromkeys('<>:"/\\|?*')})
+
+
+@lru_cache(maxsize=256)
 def validate_language_code(lang_code):
     """
     Validate language code format (3 letters for ISO 639-3).
@@ -18,6 +28,7 @@ def validate_language_code(lang_code):
     return True
 
 
+@lru_cache(maxsize=256)
 def validate_filename(filename):
     """
     Validate ZIM filename (no special characters except dash/underscore).
@@ -30,10 +41,10 @@ def validate_filename(filename):
     """
     if not filename:
         return False
-    invalid_chars = '<>:"/\\|?*'
-    return not any(char in filename for char in invalid_chars)
+    return _INVALID_FILENAME_RE.search(filename) is None
 
 
+@lru_cache(maxsize=256)
 def sanitize_filename(filename):
     """
     Sanitize filename by replacing spaces and removing invalid characters.
@@ -44,8 +55,4 @@ def sanitize_filename(filename):
     Returns:
         str: Sanitized filename
     """
-    filename = filename.replace(' ', '-')
-    invalid_chars = '<>:"/\\|?*'
-    for char in invalid_chars:
-        filename = filename.replace(char, '')
-    return filename
+    return filename.translate(_SANITIZE_TABLE)
@@ -2,12 +2,28 @@
 ZIM Item wrapper class for libzim.
 """
 
-from libzim.writer import Item, StringProvider, FileProvider, Hint, Blob
+from libzim.writer import Item, StringProvider, FileProvider, Hint
+
+
+def _file_provider(item):
+    return FileProvider(item.fpath)
+
+
+def _string_provider(item):
+    # StringProvider accepts both str and already-encoded bytes
+    return StringProvider(item.content)
 
 
 class MyItem(Item):
     """Custom Item implementation for ZIM archive creation."""
 
+    # libzim's base Item still carries a __dict__ (for its own _blob), but our
+    # fields live in slots so per-entry attribute storage stays compact
+    __slots__ = ('path', 'title', 'content', 'fpath', 'mimetype', '_provider')
+
+    # Every entry gets the same hints; share one dict instead of building one per item
+    _HINTS = {Hint.FRONT_ARTICLE: True}
+
     def __init__(self, title, path, content="", fpath=None, mimetype="text/html"):
         super().__init__()
         self.path = path
@@ -15,6 +31,8 @@ class MyItem(Item):
         self.content = content
         self.fpath = fpath
         self.mimetype = mimetype
+        # Pick the content provider once instead of on every write
+        self._provider = _file_provider if fpath is not None else _string_provider
 
     def get_path(self):
         return self.path
@@ -26,12 +44,7 @@ class MyItem(Item):
         return self.mimetype
 
     def get_contentprovider(self):
-        if self.fpath is not None:
-            return FileProvider(self.fpath)
-
-        if isinstance(self.content, bytes):
-            return Blob(self.content)
-        return StringProvider(self.content)
+        return self._provider(self)
 
     def get_hints(self):
-        return {Hint.FRONT_ARTICLE: True}
+        return self._HINTS
@@ -7,10 +7,18 @@ Creates a JSON configuration file with all settings needed by website_converter.
 
 import argparse
 import json
+import os
 import re
 import sys
+from functools import lru_cache
 from pathlib import Path
 
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
 
 # ISO 639-3 codes (common subset)
 COMMON_LANGUAGES = {
@@ -28,38 +36,76 @@ COMMON_LANGUAGES = {
     "ara": "Arabic",
 }
 
+# Shown at the language prompt
+_LANG_HINT = ', '.join(f'{k} ({v})' for k, v in list(COMMON_LANGUAGES.items())[:6])
+
+# ISO 639-3 shape: exactly three lowercase ASCII letters
+_LANG_RE = re.compile(r'^[a-z]{3}$')
+
+# Characters not allowed in filenames
+_INVALID_FILENAME_RE = re.compile(r'[<>:"/\\|?*]')
+
+# Filesystem-invalid characters and spaces all become dashes
+_SANITIZE_TABLE = str.maketrans(dict.fromkeys('<>:"/\\|?* ', '-'))
+
+# httrack bookkeeping folders that are never the site itself
+_SKIP_SITE_DIRS = frozenset({'hts-cache', '_external'})
+
 
+def _dump_config_json(data):
+    """Serialize a config dict as indented UTF-8 JSON, via orjson when available."""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2)
+    return json.dumps(data, indent=2, ensure_ascii=False).encode('utf-8')
+
+
+@lru_cache(maxsize=256)
 def validate_language_code(code):
     """Check that code is a 3-letter lowercase string."""
-    return bool(re.match(r'^[a-z]{3}$', code))
+    return bool(_LANG_RE.match(code))
 
 
+@lru_cache(maxsize=256)
 def validate_filename(name):
     """Check for invalid filename characters."""
-    invalid = '<>:"/\\|?*'
-    return all(c not in name for c in invalid) and len(name) > 0
+    return len(name) > 0 and _INVALID_FILENAME_RE.search(name) is None
 
 
 def sanitize_filename(name):
     """Remove invalid characters from filename."""
-    invalid = '<>:"/\\|?* '
-    for c in invalid:
-        name = name.replace(c, '-')
+    name = name.translate(_SANITIZE_TABLE)
     name = re.sub(r'-+', '-', name).strip('-')
     return name or 'unnamed'
 
 
-def prompt(label, default=None, required=False, validator=None, sanitizer=None):
+def ask(text):
+    """
+    Read one stripped answer from stdin.
+
+    Once stdin is exhausted (e.g. answers piped in from a script), every
+    further question gets an empty answer, so its default applies.
+    """
+    try:
+        return input(text).strip()
+    except EOFError:
+        return ""
+
+
+def prompt(label, default=None, required=False, *, validator=None, sanitizer=None):
     """Prompt the user for a value with optional default, validation, and sanitization."""
     while True:
         if default:
-            raw = input(f"  {label} [{default}]: ").strip()
+            raw = ask(f"  {label} [{default}]: ")
         else:
-            raw = input(f"  {label}: ").strip()
+            raw = ask(f"  {label}: ")
 
         value = raw or default
 
         if required and not value:
+            if not sys.stdin.isatty():
+                # Scripted input: asking again would never get an answer
+                print(f"\nError: {label} is required.")
+                sys.exit(1)
             print("    This field is required.")
             continue
 
@@ -81,10 +127,12 @@ def detect_site_path(base_dir):
         return None
 
     # Look for subdirectories that look like domain names (contain a dot)
-    candidates = []
-    for child in sorted(base.iterdir()):
-        if child.is_dir() and child.name not in ('hts-cache', '_external'):
-            candidates.append(child)
+    with os.scandir(base) as it:
+        candidates = sorted(
+            (Path(entry.path) for entry in it
+             if entry.name not in _SKIP_SITE_DIRS and entry.is_dir()),
+            key=lambda p: p.name,
+        )
 
     if len(candidates) == 1:
         return str(candidates[0])
@@ -93,7 +141,7 @@ def detect_site_path(base_dir):
         print(f"\n  Multiple subdirectories found in {base_dir}:")
         for i, c in enumerate(candidates, 1):
             print(f"    {i}. {c.name}")
-        choice = input(f"  Choose [1]: ").strip()
+        choice = ask(f"  Choose [1]: ")
         try:
             idx = int(choice) - 1 if choice else 0
             return str(candidates[idx])
@@ -135,7 +183,7 @@ Examples:
     else:
         print("Where is the website content?")
         print("  (e.g., downloads/my-site/example.com or myblog/_site/)")
-        hint = input("  Enter path or parent directory to scan: ").strip()
+        hint = ask("  Enter path or parent directory to scan: ")
 
         if not hint:
             print("Error: site path is required.")
@@ -147,8 +195,7 @@ Examples:
             sys.exit(1)
 
         # Check if the path has HTML files directly
-        html_files = list(p.glob("*.html"))
-        if html_files:
+        if next(p.glob("*.html"), None) is not None:
             site_path = str(p)
         else:
             detected = detect_site_path(hint)
@@ -161,7 +208,7 @@ Examples:
     # Verify the path exists
     if not Path(site_path).is_dir():
         print(f"Warning: {site_path} does not exist or is not a directory.")
-        cont = input("  Continue anyway? [y/N]: ").strip().lower()
+        cont = ask("  Continue anyway? [y/N]: ").lower()
         if cont != 'y':
             sys.exit(1)
 
@@ -176,7 +223,7 @@ Examples:
     publisher = prompt("Publisher", default="You")
     description = prompt("Description", required=True)
 
-    print(f"\n  Common language codes: {', '.join(f'{k} ({v})' for k, v in list(COMMON_LANGUAGES.items())[:6])}")
+    print(f"\n  Common language codes: {_LANG_HINT}")
     language = prompt("Language (ISO 639-3)", default="eng", required=True,
                       validator=validate_language_code)
 
@@ -187,9 +234,9 @@ Examples:
     output_path = prompt("Output directory for ZIM files", default="zim_files")
     icon = prompt("Icon path", default="icons/comment.png")
 
-    resolve_ext = input("  Resolve external dependencies? [y/N]: ").strip().lower() == 'y'
-    cleanup = input("  Clean up unreferenced assets? [y/N]: ").strip().lower() == 'y'
-    optimize = input("  Optimize images? [y/N]: ").strip().lower() == 'y'
+    resolve_ext = ask("  Resolve external dependencies? [y/N]: ").lower() == 'y'
+    cleanup = ask("  Clean up unreferenced assets? [y/N]: ").lower() == 'y'
+    optimize = ask("  Optimize images? [y/N]: ").lower() == 'y'
 
     max_width = 1920
     quality = 85
@@ -234,13 +281,12 @@ Examples:
     out_file.parent.mkdir(parents=True, exist_ok=True)
 
     if out_file.exists():
-        overwrite = input(f"\n  {out_file} already exists. Overwrite? [y/N]: ").strip().lower()
+        overwrite = ask(f"\n  {out_file} already exists. Overwrite? [y/N]: ").lower()
         if overwrite != 'y':
             print("Aborted.")
             sys.exit(0)
 
-    with open(out_file, 'w', encoding='utf-8') as f:
-        json.dump(config, f, indent=2, ensure_ascii=False)
+    out_file.write_bytes(_dump_config_json(config))
 
     print(f"\n=== Config saved to {out_file} ===")
     print(f"\nTo create the ZIM file:")
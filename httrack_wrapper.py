@@ -8,11 +8,17 @@ Creates download folder, downloads content, and generates config file.
 
 import argparse
 import json
+import os
 import re
+import shlex
 import subprocess
 import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from pathlib import Path
-from urllib.parse import urlparse, urljoin
+from urllib.parse import urlsplit, urljoin
 
 try:
     import urllib.request
@@ -27,46 +33,108 @@ try:
 except ImportError:
     PILLOW_AVAILABLE = False
 
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# Favicon <link> tag, with rel before href (group 1) or href before rel (group 2)
+_FAVICON_LINK_RE = re.compile(
+    r'<link[^>]+(?:rel=["\'](?:shortcut )?icon["\'][^>]+href=["\']([^"\']+)["\']'
+    r'|href=["\']([^"\']+)["\'][^>]+rel=["\'](?:shortcut )?icon["\'])',
+    re.IGNORECASE,
+)
+
+# Favicon links live in <head>, so only this much of each page is scanned
+FAVICON_SCAN_BYTES = 16 * 1024
+
+# Larger favicon responses are skipped rather than decoded
+MAX_FAVICON_BYTES = 1024 * 1024
+
+# Per-request timeout (seconds) for favicon lookups
+FAVICON_TIMEOUT = 5
+
+# Written into hts-cache/ once httrack exits successfully; httrack's own
+# hts-cache/new.txt is updated during the crawl, so it cannot tell a
+# finished mirror from an interrupted one
+MIRROR_COMPLETE_MARKER = "zimsite-complete"
+
+# Spaces and underscores become dashes, invalid characters are dropped
+_NAME_TABLE = str.maketrans({' ': '-', '_': '-', **dict.fromkeys('<>:"/\\|?*.')})
+
+# Domain decorations dropped when deriving a title, then separators become spaces
+_TITLE_STRIP_RE = re.compile(r'www\.|\.(?:com|org|net)')
+_TITLE_TABLE = str.maketrans('-_', '  ')
+
+# Cheap sanity check for mirror targets: optional scheme and credentials, a
+# host (name, IPv4 or bracketed IPv6 literal), optional port and an optional
+# path/query, with no whitespace anywhere
+_URL_RE = re.compile(
+    r'^(?:(?:https?|ftp)://)?(?:[^\s/?#@]+@)?(?:\[[0-9a-f:.]+\]|[^\s/?#:@\[\]]+)(?::\d+)?(?:[/?#]\S*)?$',
+    re.IGNORECASE,
+)
+
 
+# Per-thread output prefix; set by wrap_url for concurrent --jobs mirrors
+_job_output = threading.local()
+
+
+def _print(*args, file=None):
+    """print(), with every line tagged by the current job's prefix, if any."""
+    text = ' '.join(map(str, args))
+    prefix = getattr(_job_output, 'prefix', '')
+    if prefix:
+        text = '\n'.join(prefix + line if line else line for line in text.split('\n'))
+    print(text, file=file)
+
+
+@lru_cache(maxsize=32)
+def _split_url(url):
+    """urlsplit, memoized so the name, config and favicon steps parse the URL once."""
+    return urlsplit(url)
+
+
+@lru_cache(maxsize=256)
 def derive_name_from_url(url):
     """Extract a sensible name from a URL."""
-    parsed = urlparse(url)
-    domain = parsed.netloc or parsed.path
-
-    # Remove common prefixes
-    domain = domain.replace('www.', '')
+    parsed = _split_url(url)
 
     # Get path component if it exists
     path = parsed.path.strip('/')
 
     if path:
         # Use last part of path
-        name = path.split('/')[-1]
+        name = path.rpartition('/')[2]
     else:
-        # Use domain name
-        name = domain.split('.')[0]
+        # Use domain name, without the common www. prefix
+        domain = (parsed.netloc or parsed.path).replace('www.', '')
+        name = domain.partition('.')[0]
 
     # Sanitize name
-    name = name.replace(' ', '-').replace('_', '-')
-    invalid_chars = '<>:"/\\|?*.'
-    for char in invalid_chars:
-        name = name.replace(char, '')
+    name = name.translate(_NAME_TABLE)
 
     return name.lower()
 
 
+def _dump_config_json(data):
+    """Serialize a config dict as indented UTF-8 JSON, via orjson when available."""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2)
+    return json.dumps(data, indent=2, ensure_ascii=False).encode('utf-8')
+
+
 def create_config_file(name, url, download_dir, config_dir='config', resolve_external=False, icon=None):
     """Create a configuration file for the downloaded website."""
     config_dir = Path(config_dir)
-    config_dir.mkdir(exist_ok=True)
+    os.makedirs(config_dir, exist_ok=True)
 
     config_file = config_dir / f"{name}.json"
 
     # Parse domain for title
-    parsed = urlparse(url)
+    parsed = _split_url(url)
     domain = parsed.netloc or parsed.path
-    title = domain.replace('www.', '').replace('.com', '').replace('.org', '').replace('.net', '')
-    title = title.replace('-', ' ').replace('_', ' ').title()
+    title = _TITLE_STRIP_RE.sub('', domain).translate(_TITLE_TABLE).title()
 
     # Detect site_path: httrack puts content in a subdirectory named after the domain
     site_path = None
@@ -95,16 +163,20 @@ def create_config_file(name, url, download_dir, config_dir='config', resolve_ext
     if icon:
         config_data["icon"] = icon
 
-    with open(config_file, 'w', encoding='utf-8') as f:
-        json.dump(config_data, f, indent=2, ensure_ascii=False)
+    config_file.write_bytes(_dump_config_json(config_data))
 
     return config_file
 
 
-def run_httrack(url, output_dir, additional_args=None):
-    """Run httrack to download website."""
+def run_httrack(url, output_dir, additional_args=None, quiet=False):
+    """Run httrack to download website.
+
+    With quiet=True httrack's progress output is discarded instead of being
+    written to the inherited terminal/pipe; its stderr is captured and only
+    shown if the run fails.
+    """
     output_path = Path(output_dir)
-    output_path.mkdir(parents=True, exist_ok=True)
+    os.makedirs(output_path, exist_ok=True)
 
     # Base httrack command
     cmd = ['httrack', url, '-O', str(output_path)]
@@ -113,47 +185,90 @@ def run_httrack(url, output_dir, additional_args=None):
     if additional_args:
         cmd.extend(additional_args)
 
-    print(f"Running httrack to download {url}...")
-    print(f"Command: {' '.join(cmd)}")
+    _print(f"Running httrack to download {url}...")
+    _print(f"Command: {' '.join(cmd)}")
+
+    # A previous success no longer vouches for this mirror once it is re-run
+    marker = output_path / "hts-cache" / MIRROR_COMPLETE_MARKER
+    marker.unlink(missing_ok=True)
 
     try:
-        result = subprocess.run(cmd, check=True)
+        if quiet:
+            result = subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL,
+                                    stderr=subprocess.PIPE)
+        else:
+            result = subprocess.run(cmd, check=True)
+        marker.parent.mkdir(exist_ok=True)
+        marker.touch()
         return result.returncode == 0
     except subprocess.CalledProcessError as e:
-        print(f"Error: httrack failed with return code {e.returncode}", file=sys.stderr)
+        _print(f"Error: httrack failed with return code {e.returncode}", file=sys.stderr)
+        if e.stderr:
+            _print(e.stderr.decode('utf-8', errors='replace'), file=sys.stderr)
         return False
     except FileNotFoundError:
-        print("Error: httrack not found. Install with: sudo apt install httrack", file=sys.stderr)
+        _print("Error: httrack not found. Install with: sudo apt install httrack", file=sys.stderr)
+        return False
+
+
+def mirror_is_fresh(download_dir, max_age_hours):
+    """Check whether httrack already completed a recent mirror in download_dir.
+
+    The mirror counts as complete when run_httrack left its completion
+    marker (written only after httrack exited 0) and httrack's
+    hts-in_progress.lock is absent. httrack's own hts-cache/new.txt is
+    written while it crawls, so it is not used as a completion signal.
+    """
+    download_path = Path(download_dir)
+    if (download_path / "hts-in_progress.lock").exists():
+        return False
+    marker = download_path / "hts-cache" / MIRROR_COMPLETE_MARKER
+    try:
+        age = time.time() - marker.stat().st_mtime
+    except OSError:
         return False
+    return age < max_age_hours * 3600
 
 
 def find_favicon_in_download(download_dir):
     """Look for a favicon in the httrack downloaded files."""
     download_path = Path(download_dir)
 
-    # Common favicon filenames, ordered by preference
-    favicon_names = ['favicon.ico', 'favicon.png', 'favicon.svg',
-                     'apple-touch-icon.png', 'apple-touch-icon-precomposed.png']
+    # Common favicon filenames, ranked by preference
+    favicon_ranks = {
+        'favicon.ico': 0,
+        'favicon.png': 1,
+        'favicon.svg': 2,
+        'apple-touch-icon.png': 3,
+        'apple-touch-icon-precomposed.png': 4,
+    }
 
-    # Search recursively for favicon files
-    for name in favicon_names:
-        matches = list(download_path.rglob(name))
-        if matches:
-            return matches[0]
+    # Walk the tree once, keeping the best-ranked favicon file and
+    # collecting index.html pages for the <link> fallback
+    best_rank, best_path = len(favicon_ranks), None
+    html_files = []
+    for dirpath, _, filenames in os.walk(download_path):
+        for filename in filenames:
+            rank = favicon_ranks.get(filename.lower())
+            if rank is not None and rank < best_rank:
+                best_rank, best_path = rank, Path(dirpath) / filename
+            elif filename == 'index.html':
+                html_files.append(Path(dirpath) / filename)
+        if best_rank == 0:
+            break
+
+    if best_path is not None:
+        return best_path
 
     # Try to find favicon link in downloaded HTML
-    for html_file in download_path.rglob('index.html'):
+    for html_file in html_files:
         try:
-            content = html_file.read_text(encoding='utf-8', errors='ignore')
+            with open(html_file, 'rb') as f:
+                content = f.read(FAVICON_SCAN_BYTES).decode('utf-8', errors='ignore')
             # Match <link rel="icon" ...> or <link rel="shortcut icon" ...>
-            pattern = r'<link[^>]+rel=["\'](?:shortcut )?icon["\'][^>]+href=["\']([^"\']+)["\']'
-            match = re.search(pattern, content, re.IGNORECASE)
-            if not match:
-                # Try reversed order: href before rel
-                pattern = r'<link[^>]+href=["\']([^"\']+)["\'][^>]+rel=["\'](?:shortcut )?icon["\']'
-                match = re.search(pattern, content, re.IGNORECASE)
+            match = _FAVICON_LINK_RE.search(content)
             if match:
-                href = match.group(1)
+                href = match.group(1) or match.group(2)
                 # Resolve relative path from the HTML file's directory
                 if not href.startswith(('http://', 'https://', '//')):
                     candidate = (html_file.parent / href).resolve()
@@ -177,7 +292,7 @@ def fetch_favicon_from_url(url):
     if not URLLIB_AVAILABLE:
         return None
 
-    parsed = urlparse(url)
+    parsed = _split_url(url)
     base_url = f"{parsed.scheme}://{parsed.netloc}"
 
     # Try common favicon URLs
@@ -187,32 +302,33 @@ def fetch_favicon_from_url(url):
         urljoin(base_url, '/apple-touch-icon.png'),
     ]
 
-    # Also try to parse the page for a favicon link
+    # Prefer the favicon link declared by the page itself
     try:
         req = urllib.request.Request(url, headers={'User-Agent': 'Mozilla/5.0'})
-        with urllib.request.urlopen(req, timeout=10) as response:
-            html = response.read().decode('utf-8', errors='ignore')
-            pattern = r'<link[^>]+rel=["\'](?:shortcut )?icon["\'][^>]+href=["\']([^"\']+)["\']'
-            match = re.search(pattern, html, re.IGNORECASE)
-            if not match:
-                pattern = r'<link[^>]+href=["\']([^"\']+)["\'][^>]+rel=["\'](?:shortcut )?icon["\']'
-                match = re.search(pattern, html, re.IGNORECASE)
+        with urllib.request.urlopen(req, timeout=FAVICON_TIMEOUT) as response:
+            html = response.read(FAVICON_SCAN_BYTES).decode('utf-8', errors='ignore')
+            match = _FAVICON_LINK_RE.search(html)
             if match:
-                href = match.group(1)
-                resolved = urljoin(url, href)
-                # Insert at the beginning so it's tried first
-                favicon_urls.insert(0, resolved)
+                href = match.group(1) or match.group(2)
+                # The page declares its icon, so skip the blind guesses
+                favicon_urls = [urljoin(url, href)]
     except Exception:
         pass
 
     for fav_url in favicon_urls:
         try:
-            req = urllib.request.Request(fav_url, headers={'User-Agent': 'Mozilla/5.0'})
-            with urllib.request.urlopen(req, timeout=10) as response:
+            req = urllib.request.Request(fav_url, headers={
+                'User-Agent': 'Mozilla/5.0',
+                'Accept-Encoding': 'identity',
+            })
+            with urllib.request.urlopen(req, timeout=FAVICON_TIMEOUT) as response:
                 if response.status == 200:
                     content_type = response.headers.get('Content-Type', '')
                     if 'image' in content_type or fav_url.endswith(('.ico', '.png', '.svg')):
-                        return response.read(), fav_url
+                        data = response.read(MAX_FAVICON_BYTES + 1)
+                        if len(data) > MAX_FAVICON_BYTES:
+                            continue
+                        return data, fav_url
         except Exception:
             continue
 
@@ -224,16 +340,18 @@ def convert_favicon_to_png(image_data, output_path, size=48):
     if PILLOW_AVAILABLE:
         try:
             img = Image.open(io.BytesIO(image_data))
-            # For ICO files with multiple sizes, pick the best one
-            if hasattr(img, 'n_frames') and img.format == 'ICO':
-                # ICO files can have multiple sizes, Pillow picks the first
-                pass
+            # For ICO files with multiple sizes, pick the smallest frame that
+            # is at least the target size so we only ever downscale
+            if img.format == 'ICO':
+                frame_sizes = sorted(img.ico.sizes())
+                best = next((fs for fs in frame_sizes if min(fs) >= size), frame_sizes[-1])
+                img = img.ico.getimage(best)
             img = img.convert('RGBA')
             img = img.resize((size, size), Image.LANCZOS)
             img.save(output_path, 'PNG')
             return True
         except Exception as e:
-            print(f"Warning: Failed to convert favicon with Pillow: {e}")
+            _print(f"Warning: Failed to convert favicon with Pillow: {e}")
             return False
     else:
         # Without Pillow, save raw data only if it's already PNG
@@ -242,8 +360,8 @@ def convert_favicon_to_png(image_data, output_path, size=48):
                 f.write(image_data)
             return True
         else:
-            print("Warning: Pillow not installed, cannot convert favicon to PNG.")
-            print("  Install with: pip install Pillow")
+            _print("Warning: Pillow not installed, cannot convert favicon to PNG.")
+            _print("  Install with: pip install Pillow")
             return False
 
 
@@ -257,30 +375,96 @@ def fetch_and_save_favicon(url, download_dir, name, icons_dir='icons'):
     output_path = icons_path / f"{name}.png"
 
     # First, look in the downloaded files
-    print("Looking for favicon in downloaded files...")
+    _print("Looking for favicon in downloaded files...")
     local_favicon = find_favicon_in_download(download_dir)
     if local_favicon:
-        print(f"  Found local favicon: {local_favicon}")
+        _print(f"  Found local favicon: {local_favicon}")
         image_data = local_favicon.read_bytes()
         if convert_favicon_to_png(image_data, output_path):
-            print(f"  Saved icon: {output_path}")
+            _print(f"  Saved icon: {output_path}")
             return str(output_path)
 
     # Second, try fetching directly from the website
-    print("Fetching favicon from website...")
+    _print("Fetching favicon from website...")
     result = fetch_favicon_from_url(url)
     if result:
         image_data, fav_url = result
-        print(f"  Found favicon at: {fav_url}")
+        _print(f"  Found favicon at: {fav_url}")
         if convert_favicon_to_png(image_data, output_path):
-            print(f"  Saved icon: {output_path}")
+            _print(f"  Saved icon: {output_path}")
             return str(output_path)
 
-    print("  No favicon found.")
+    _print("  No favicon found.")
     return None
 
 
-def main():
+def wrap_url(url, args, tag_output=False):
+    """Download one URL and write its icon and config file.
+
+    Args:
+        url: Website URL to mirror
+        args: Parsed command-line arguments
+        tag_output: Prefix every status line with the project name, so the
+            output of concurrent jobs can be told apart
+    """
+    # Determine project name
+    name = args.name or derive_name_from_url(url)
+    _job_output.prefix = f"[{name}] " if tag_output else ''
+    if not args.name:
+        _print(f"Auto-generated name: {name}")
+
+    # Create download directory path
+    download_dir = Path(args.output) / name
+
+    # Download with httrack if not skipping
+    if not args.skip_download and not args.force and mirror_is_fresh(download_dir, args.max_age):
+        _print(f"Existing mirror in {download_dir} is less than {args.max_age}h old, "
+              f"skipping download (use --force to re-download)")
+    elif not args.skip_download:
+        # Parse additional httrack arguments
+        httrack_args = shlex.split(args.httrack_args) if args.httrack_args else []
+
+        success = run_httrack(url, download_dir, httrack_args, quiet=args.quiet)
+        if not success:
+            _print("Download failed. Config file will still be created.", file=sys.stderr)
+    else:
+        _print("Skipping download (--skip-download)")
+        download_dir.mkdir(parents=True, exist_ok=True)
+
+    # Try to fetch favicon
+    icon_path = None
+    if not args.no_favicon:
+        _print(f"\n=== Fetching Favicon ===")
+        icon_path = fetch_and_save_favicon(url, download_dir, name)
+
+    # Create config file
+    _print(f"\nCreating config file...")
+    config_file = create_config_file(name, url, download_dir, args.config_dir,
+                                     resolve_external=args.resolve_external,
+                                     icon=icon_path)
+    _print(f"Config file created: {config_file}")
+
+    # Emit the summary in one write so concurrent jobs don't interleave it
+    summary = [
+        "\n=== Summary ===",
+        f"Project name: {name}",
+        f"Download directory: {download_dir}",
+        f"Config file: {config_file}",
+        f"Icon: {icon_path or 'not found (using default)'}",
+        f"Resolve external deps: {args.resolve_external}",
+    ]
+    if not args.skip_download:
+        summary += [
+            "\nNext steps:",
+            f"1. Review and edit config file: {config_file}",
+            "2. Convert to ZIM:",
+            f"   python3 website_converter.py {config_file}",
+        ]
+    _print("\n".join(summary))
+
+
+def _build_parser():
+    """Build the command-line parser."""
     parser = argparse.ArgumentParser(
         description="HTTrack wrapper for downloading websites and preparing for ZIM conversion",
         formatter_class=argparse.RawDescriptionHelpFormatter,
@@ -297,10 +481,13 @@ Examples:
 
   # Pass additional httrack options
   python3 httrack_wrapper.py https://example.com/ --httrack-args "-r3 --max-rate=1000000"
+
+  # Mirror several sites in one run
+  python3 httrack_wrapper.py https://example.com/ https://example.org/
         """
     )
 
-    parser.add_argument("url", help="URL to download")
+    parser.add_argument("urls", nargs="+", metavar="url", help="URL(s) to download")
     parser.add_argument("--name", help="Name for the project (auto-generated from URL if not provided)")
     parser.add_argument("--output", default="downloads", help="Output directory for downloads (default: downloads)")
     parser.add_argument("--config-dir", default="config", help="Directory for config files (default: config)")
@@ -308,56 +495,48 @@ Examples:
     parser.add_argument("--skip-download", action="store_true", help="Skip download, only create config file")
     parser.add_argument("--resolve-external", action="store_true", help="Enable external dependency resolution during ZIM conversion")
     parser.add_argument("--no-favicon", action="store_true", help="Skip favicon fetching")
+    parser.add_argument("--quiet", action="store_true", help="Discard httrack's own progress output")
+    parser.add_argument("--force", action="store_true", help="Re-download even if a recent mirror already exists")
+    parser.add_argument("--max-age", type=float, default=24,
+                        help="Reuse an existing mirror younger than this many hours (default: 24)")
+    parser.add_argument("--jobs", type=int, default=1,
+                        help="Number of URLs to mirror concurrently (default: 1; combine with --quiet)")
 
-    args = parser.parse_args()
-
-    # Determine project name
-    if args.name:
-        name = args.name
-    else:
-        name = derive_name_from_url(args.url)
-        print(f"Auto-generated name: {name}")
+    return parser
 
-    # Create download directory path
-    download_dir = Path(args.output) / name
 
-    # Download with httrack if not skipping
-    if not args.skip_download:
-        # Parse additional httrack arguments
-        httrack_args = args.httrack_args.split() if args.httrack_args else []
+def main():
+    parser = _build_parser()
+    args = parser.parse_args()
 
-        success = run_httrack(args.url, download_dir, httrack_args)
-        if not success:
-            print("Download failed. Config file will still be created.", file=sys.stderr)
+    if args.name and len(args.urls) > 1:
+        parser.error("--name can only be used with a single URL")
+
+    # Reject malformed URLs before any httrack process is spawned
+    bad_urls = [url for url in args.urls if not _URL_RE.match(url)]
+    if bad_urls:
+        parser.error(f"invalid URL(s): {', '.join(bad_urls)}")
+
+    # Each name is a download directory and a config file; two URLs sharing
+    # one would overwrite each other (and race when run with --jobs)
+    if len(args.urls) > 1:
+        urls_by_name = {}
+        for url in args.urls:
+            urls_by_name.setdefault(derive_name_from_url(url), []).append(url)
+        clashes = [f"{name} ({', '.join(urls)})" for name, urls in urls_by_name.items() if len(urls) > 1]
+        if clashes:
+            parser.error(f"URLs map to the same name: {'; '.join(clashes)}. "
+                         f"Run them separately with --name")
+
+    if args.jobs > 1 and len(args.urls) > 1:
+        # The work happens in the httrack subprocesses, so threads are enough
+        with ThreadPoolExecutor(max_workers=args.jobs) as pool:
+            futures = [pool.submit(wrap_url, url, args, tag_output=True) for url in args.urls]
+            for future in futures:
+                future.result()
     else:
-        print("Skipping download (--skip-download)")
-        download_dir.mkdir(parents=True, exist_ok=True)
-
-    # Try to fetch favicon
-    icon_path = None
-    if not args.no_favicon:
-        print(f"\n=== Fetching Favicon ===")
-        icon_path = fetch_and_save_favicon(args.url, download_dir, name)
-
-    # Create config file
-    print(f"\nCreating config file...")
-    config_file = create_config_file(name, args.url, download_dir, args.config_dir,
-                                     resolve_external=args.resolve_external,
-                                     icon=icon_path)
-    print(f"Config file created: {config_file}")
-
-    print(f"\n=== Summary ===")
-    print(f"Project name: {name}")
-    print(f"Download directory: {download_dir}")
-    print(f"Config file: {config_file}")
-    print(f"Icon: {icon_path or 'not found (using default)'}")
-    print(f"Resolve external deps: {args.resolve_external}")
-
-    if not args.skip_download:
-        print(f"\nNext steps:")
-        print(f"1. Review and edit config file: {config_file}")
-        print(f"2. Convert to ZIM:")
-        print(f"   python3 website_converter.py {config_file}")
+        for url in args.urls:
+            wrap_url(url, args)
 
 
 if __name__ == "__main__":
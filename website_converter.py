@@ -8,6 +8,8 @@ Otherwise, it should handle page relativity itself.
 import argparse
 import logging
 import sys
+import time
+from collections import Counter
 from datetime import datetime
 from pathlib import Path
 from types import SimpleNamespace
@@ -21,8 +23,11 @@ from converter import (
     validate_language_code,
     validate_filename,
     sanitize_filename,
-    is_pillow_available,
+    is_optimizer_available,
+    prune_image_cache,
     generate_link_validation_report,
+    collect_site_files,
+    order_for_archive,
     process_dry_run,
     process_files,
     cleanup_unreferenced,
@@ -85,11 +90,12 @@ Create a config file interactively:
         optimize_images=config["optimize_images"],
         max_image_width=config["max_image_width"],
         image_quality=config["image_quality"],
+        image_cache_dir=None,
     )
 
     # Check feature dependencies
-    if args.optimize_images and not is_pillow_available():
-        logger.warning("optimize_images requires Pillow. Install with: pip install Pillow")
+    if args.optimize_images and not is_optimizer_available():
+        logger.warning("optimize_images requires pyvips or Pillow. Install with: pip install pyvips (or Pillow)")
         logger.warning("Continuing without image optimization.")
         args.optimize_images = False
 
@@ -118,6 +124,19 @@ Create a config file interactively:
         logger.error(f"Failed to create output directory: {e}")
         sys.exit(1)
 
+    # Optimized images are cached next to the archive so a rebuild does not
+    # re-encode unchanged images; a dry-run only reads an existing cache
+    image_cache_dir = save_path / ".opt-cache"
+    if args.optimize_images and args.dry_run:
+        if image_cache_dir.is_dir():
+            args.image_cache_dir = str(image_cache_dir)
+    elif args.optimize_images:
+        try:
+            image_cache_dir.mkdir(exist_ok=True)
+            args.image_cache_dir = str(image_cache_dir)
+        except OSError as e:
+            logger.warning(f"Image optimization cache disabled: {e}")
+
     # Validate and sanitize metadata
     filename = config["name"]
     lang = config["language"]
@@ -150,14 +169,15 @@ Create a config file interactively:
     except Exception as e:
         logger.warning(f"Failed to read icon: {e}. Proceeding without icon.")
 
+    # Keys are the ZIM metadata names, ready to pass to add_metadata
     dic_metadata = {
-        "creator": creator,
-        "description": description,
-        "name": filename,
-        "publisher": publisher,
-        "title": title,
-        "language": lang,
-        "date": current_date,
+        "Creator": creator,
+        "Description": description,
+        "Name": filename,
+        "Publisher": publisher,
+        "Title": title,
+        "Language": lang,
+        "Date": current_date,
     }
 
     if args.dry_run:
@@ -175,12 +195,13 @@ Create a config file interactively:
     resolve_external = config.get('resolve_external', False)
     url_mapping = None
     if resolve_external:
-        url_mapping = resolve_external_dependencies(load_path, logger)
+        url_mapping = resolve_external_dependencies(
+            load_path, logger, cache_file=save_path / f".{filename}.external-cache.json")
         if url_mapping:
             logger.info(f"Resolved {len(url_mapping)} external dependency URLs")
 
     # Count files for progress bar (after external deps download so _external/ is included)
-    all_files = [f for f in load_path.rglob("*") if f.is_file()]
+    all_files = collect_site_files(load_path)
     total_files = len(all_files)
     logger.info(f"Found {total_files} files to process")
 
@@ -198,6 +219,9 @@ Create a config file interactively:
         )
     else:
         # Normal mode - create ZIM file
+        # Write related content (main page, pages, styles, images) clustered
+        all_files = order_for_archive(all_files, load_path)
+        build_started = time.time()
         try:
             with Creator(str(save_path / f"{filename}.zim")).config_indexing(True, lang) as creator:
                 creator.set_mainpath("index.html")
@@ -221,7 +245,7 @@ Create a config file interactively:
                 logger.info("=== Adding metadata ===")
                 try:
                     for name, value in dic_metadata.items():
-                        creator.add_metadata(name.title(), value)
+                        creator.add_metadata(name, value)
                 except Exception as e:
                     logger.error(f"Failed to add metadata: {e}")
 
@@ -231,6 +255,13 @@ Create a config file interactively:
             logger.error(f"Failed to create ZIM archive: {e}")
             sys.exit(1)
 
+        # Drop cache entries this build did not use (edited or removed
+        # images, other quality/max-width settings)
+        if args.image_cache_dir:
+            pruned = prune_image_cache(args.image_cache_dir, build_started)
+            if pruned:
+                logger.info(f"Pruned {pruned} stale image cache entries")
+
     # Summary report
     if args.dry_run:
         logger.info("=== Dry Run Analysis Complete ===")
@@ -253,22 +284,22 @@ Create a config file interactively:
 
     # Validation warnings
     if lst_unknown:
-        logger.warning(f"\nMissing mimetypes for {len(set(lst_unknown))} extensions:")
-        logger.warning(", ".join(sorted(set(lst_unknown))))
+        unknown_counts = sorted(Counter(lst_unknown).items())
+        logger.warning(f"\nMissing mimetypes for {len(unknown_counts)} extensions:")
+        logger.warning(", ".join(f"{ext or '(no extension)'}({count})" for ext, count in unknown_counts))
 
     if lst_missing_index:
         logger.warning(f"\n{len(lst_missing_index)} links ending with / but no index.html found:")
         if args.verbose:
-            for warning in lst_missing_index:
-                logger.warning(f"  {warning}")
+            # One record for the whole list rather than one per warning
+            logger.warning("  " + "\n  ".join(lst_missing_index))
         else:
             logger.warning(f"  (use --verbose to see all warnings)")
 
     if lst_errors:
         logger.error(f"\n{len(lst_errors)} files failed to process:")
         if args.verbose:
-            for error in lst_errors:
-                logger.error(f"  {error}")
+            logger.error("  " + "\n  ".join(lst_errors))
         else:
             logger.error(f"  (use --verbose to see all errors)")
 